@@ -0,0 +1,102 @@
+"""
+フレームキャプチャ処理のベンチマーク
+
+画面サーフェスから動画エンコーダへ渡すまでの1フレームあたりの処理時間を、
+従来の方法（surfarray.array3d → swapaxes → cvtColor）と、
+ピクセルバッファを直接参照する方法（surface_bgra_view）で比較する。
+
+録画（StreamingRecorder.capture）で使うのは「BGRAビュー + コピー」で、ピクセル
+バッファのコピーが1回だけ残る。エンコーダスレッドは非同期に書き込み、その間に画面は
+次のフレームで上書きされるため、このコピーは省けない。「BGRAビューのみ」は
+コピーを省いた場合の参考値（下限）で、録画には使えない。
+
+使用例:
+    python benchmark_capture.py                      # 1080x1920（縦型動画）
+    python benchmark_capture.py --size 600 600 --frames 500
+"""
+import argparse
+import os
+import time
+
+# 画面なしで実行できるようにダミードライバを使用
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import cv2
+import numpy as np
+import pygame
+
+from main import surface_bgra_view
+
+
+def capture_array3d(surface):
+    """従来の方法: array3dでコピーし、転置してRGB→BGR変換"""
+    frame = pygame.surfarray.array3d(surface)
+    frame = frame.swapaxes(0, 1)
+    return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+
+def capture_view_bgr(surface):
+    """バッファを直接参照し、VideoWriter用にBGRA→BGR変換（コピー1回）"""
+    return cv2.cvtColor(surface_bgra_view(surface), cv2.COLOR_BGRA2BGR)
+
+
+def capture_view_copy(surface):
+    """バッファを直接参照し、エンコーダスレッドへ渡すためにそのままコピー（コピー1回）"""
+    return surface_bgra_view(surface).copy()
+
+
+def capture_view(surface):
+    """バッファを直接参照するだけ（BGRAのままパイプへ書き込む場合、コピーなし）"""
+    frame = surface_bgra_view(surface)
+    return frame.nbytes
+
+
+CAPTURE_METHODS = [
+    ("array3d + swapaxes + cvtColor", capture_array3d),
+    ("BGRAビュー + cvtColor(BGRA→BGR)", capture_view_bgr),
+    ("BGRAビュー + コピー（録画で使用）", capture_view_copy),
+    ("BGRAビューのみ（コピーなし、参考値）", capture_view),
+]
+
+
+def benchmark(size, frames):
+    """各キャプチャ方法の1フレームあたりの処理時間（ミリ秒）を計測して表示する"""
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+
+    # 単色だと実際の画面と条件が変わるため、ランダムな矩形で埋める
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        color = rng.integers(0, 256, 3).tolist()
+        rect = (*rng.integers(0, size[0], 1), *rng.integers(0, size[1], 1), 200, 200)
+        pygame.draw.rect(screen, color, rect)
+
+    # 変換結果が従来の方法と一致することを確認
+    expected = capture_array3d(screen)
+    assert np.array_equal(capture_view_bgr(screen), expected)
+    assert np.array_equal(capture_view_copy(screen)[:, :, :3], expected)
+
+    print(f"解像度: {size[0]}x{size[1]}, フレーム数: {frames}")
+    baseline = None
+    for name, capture in CAPTURE_METHODS:
+        capture(screen)  # ウォームアップ
+        start = time.perf_counter()
+        for _ in range(frames):
+            capture(screen)
+        per_frame = (time.perf_counter() - start) / frames * 1000
+        if baseline is None:
+            baseline = per_frame
+        print(f"{per_frame:8.3f} ms/フレーム ({baseline / per_frame:7.1f}倍)  {name}")
+    print("録画ではエンコーダスレッドが非同期に書き込むため、フレームごとに1回のコピーが必要")
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='フレームキャプチャ処理のベンチマーク')
+    parser.add_argument('--size', type=int, nargs=2, default=[1080, 1920], metavar=('WIDTH', 'HEIGHT'),
+                        help='画面サイズ（デフォルト: 1080 1920）')
+    parser.add_argument('--frames', type=int, default=200,
+                        help='計測するフレーム数（デフォルト: 200）')
+    args = parser.parse_args()
+    benchmark(tuple(args.size), args.frames)
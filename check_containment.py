@@ -0,0 +1,92 @@
+"""
+ブロックが箱の外に出ないことの確認
+
+BlockSwarm.stepで多数のレースを描画なしで進め、上部移動壁（赤い壁）が
+下端まで移動し終えるまでの全ステップで、全ブロックが箱の内側
+（左右の壁・下の壁の内側、かつ上部移動壁より下）にあることを確認する。
+勝者が決まってもブロックは止めずに進める。ステップの大きさ（フレーム数）ごとに
+実行し、箱の外に出たブロックがあれば最初の1件を表示して終了コード1で終了する。
+
+使用例:
+    python check_containment.py                      # 200レース、dt=1と8
+    python check_containment.py --races 1000 --dt 1 4 16
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+# 画面なしで実行できるようにダミードライバを使用
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+
+from main import (BlockSwarm, ObstacleField, create_obstacles, setup_map,
+                  BLOCK_SIZE, BOX_SIZE, FPS, WALL_START_TIME, WALL_MOVE_DURATION)
+
+
+def outside_box(swarm, box_rect, moving_wall_y):
+    """箱の外にはみ出しているブロックのマスクを返す"""
+    left, top, right, bottom = swarm.bounds()
+    ceiling = box_rect.top if moving_wall_y is None else moving_wall_y
+    # 移動壁と下の壁の間がブロックより狭くなった後は、下の壁に接していればよい
+    ceiling = np.minimum(ceiling, box_rect.bottom - swarm.size)
+    return (left < box_rect.left) | (right > box_rect.right) | \
+           (top < ceiling) | (bottom > box_rect.bottom)
+
+
+def check(races, block_count, frames_per_step, seed=0):
+    """
+    races個のレースをframes_per_stepフレームずつ進め、箱の外に出たブロックを探す
+
+    Returns:
+        str: 最初に見つかった違反の説明（なければNone）
+    """
+    margin, box_rect, goal_rect = setup_map()
+    swarm = BlockSwarm()
+    for lane in range(races):
+        rng = random.Random(seed + lane)
+        for _ in range(block_count):
+            x = rng.randint(margin + 50, margin + BOX_SIZE - 50)
+            y = rng.randint(margin + 50, margin + BOX_SIZE - 50)
+            angle = rng.choice([45, 135, 225, 315])
+            swarm.add(x, y, 6 * math.cos(math.radians(angle)), 6 * math.sin(math.radians(angle)),
+                      BLOCK_SIZE, lane)
+
+    obstacle_field = ObstacleField(create_obstacles(margin))
+    # 赤い壁が下端に着いた後も少し進めて、押し込まれた状態を確認する
+    end_time = WALL_START_TIME + WALL_MOVE_DURATION + 1
+    step = 0
+    while step * frames_per_step / FPS < end_time:
+        sim_time = step * frames_per_step / FPS
+        obstacle_field.step(sim_time, frames_per_step)
+        obstacle_field.collide(swarm)
+        moving_wall_y = obstacle_field.ceiling_y()
+        swarm.step(box_rect, goal_rect, moving_wall_y, obstacle_field, frames_per_step)
+        step += 1
+
+        outside = outside_box(swarm, box_rect, moving_wall_y)
+        if outside.any():
+            i = int(np.argmax(outside))
+            return (f"シード {seed + int(swarm.lane[i])}, {sim_time:.2f}秒: ブロック "
+                    f"({swarm.x[i]:.1f}, {swarm.y[i]:.1f}) が箱 {tuple(box_rect)} "
+                    f"（上部移動壁 {moving_wall_y}）の外にあります")
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ブロックが箱の外に出ないことの確認')
+    parser.add_argument('--races', type=int, default=200, help='レース数（デフォルト: 200）')
+    parser.add_argument('-b', '--blocks', type=int, default=4, help='1レースのブロック数（デフォルト: 4）')
+    parser.add_argument('--dt', type=int, nargs='+', default=[1, 8],
+                        help='1ステップで進めるフレーム数（デフォルト: 1 8）')
+    parser.add_argument('--seed', type=int, default=0, help='最初のシード（デフォルト: 0）')
+    args = parser.parse_args()
+
+    failed = False
+    for frames_per_step in args.dt:
+        error = check(args.races, args.blocks, frames_per_step, args.seed)
+        print(f"dt={frames_per_step}: {'OK' if error is None else error}")
+        failed |= error is not None
+    sys.exit(1 if failed else 0)
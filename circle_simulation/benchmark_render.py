@@ -0,0 +1,89 @@
+"""
+Ball rendering benchmark.
+
+Compares the per-ball path (renderer.draw_balls, one pygame.draw.circle per ball) with
+renderer.BallSprites drawing the same balls through one Surface.blits call. Balls are
+scattered uniformly over the screen.
+
+Usage:
+    python benchmark_render.py                        # 1k, 10k and 100k balls
+    python benchmark_render.py --counts 5000 --frames 50
+"""
+import argparse
+import os
+import random
+import time
+
+# Run without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import config
+import physics
+import renderer
+
+
+def make_balls(count, seed=0):
+    """Returns a BallArray with count balls at random on-screen positions."""
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    balls = physics.BallArray(capacity=count)
+    for x, y in rng.uniform((0, 0), (config.WIDTH, config.HEIGHT), (count, 2)).tolist():
+        balls.add(position=(x, y), velocity=(0, 0))
+    return balls
+
+
+def render_methods():
+    """(name, draw function, pixel-identical to draw_balls) for each rendering path."""
+    blits = renderer.BallSprites()
+    antialiased = renderer.BallSprites(antialias=True)
+    return [
+        ("draw_balls (pygame.draw.circle per ball)", renderer.draw_balls, True),
+        ("BallSprites: single blits call", blits.draw, True),
+        ("BallSprites: antialiased blits", antialiased.draw, False),
+    ]
+
+
+def benchmark(counts, frames):
+    """Prints the time per frame (milliseconds) of each rendering path at each ball count."""
+    pygame.init()
+    screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT))
+    methods = render_methods()
+
+    for count in counts:
+        balls = make_balls(count)
+        print(f"Balls: {count}, frames: {frames}")
+        expected = None
+        baseline = None
+        for name, draw, exact in methods:
+            # Check the output against the per-ball path (also warms the sprite caches)
+            screen.fill(config.BLACK)
+            draw(screen, balls)
+            pixels = pygame.surfarray.array2d(screen)
+            if expected is None:
+                expected = pixels
+            elif exact:
+                assert np.array_equal(pixels, expected), name
+
+            start = time.perf_counter()
+            for _ in range(frames):
+                screen.fill(config.BLACK)
+                draw(screen, balls)
+            per_frame = (time.perf_counter() - start) / frames * 1000
+            if baseline is None:
+                baseline = per_frame
+            print(f"{per_frame:8.3f} ms/frame ({baseline / per_frame:7.1f}x)  {name}")
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ball rendering benchmark')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Ball counts to measure (default: 1000 10000 100000)')
+    parser.add_argument('--frames', type=int, default=20,
+                        help='Frames to time per method and count (default: 20)')
+    args = parser.parse_args()
+    benchmark(args.counts, args.frames)
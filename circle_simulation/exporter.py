@@ -1,7 +1,12 @@
 import pygame
 import cv2
 import numpy as np
+import math
 import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 import config
 
@@ -14,10 +19,56 @@ except ImportError:
     print("Warning: OpenCV not found. Video export disabled.")
     print("Install OpenCV using: pip install opencv-python")
 
+# Depth of the frame queue feeding the encoder thread, and what to do when it is full:
+# "block" waits for the encoder (every frame is kept), "drop" discards the frame and the
+# encoder repeats the previous one in its place (the video keeps its length)
+ENCODER_QUEUE_SIZE = 32
+QUEUE_FULL_POLICIES = ("block", "drop")
+
+def surface_bgra_view(surface):
+    """
+    Returns the surface's pixel buffer as a (height, width, 4) BGRA array without copying.
+
+    Only 32-bit BGRA/BGRX surfaces (little-endian, red mask 0xFF0000) are supported;
+    None is returned for any other pixel format. The surface stays locked while the
+    array is alive, so drop it before drawing the next frame.
+
+    VideoExporter.capture_frame() copies this array once per captured frame: the
+    encoder thread writes frames asynchronously, after the screen has been redrawn,
+    so the queued frame cannot be a view. No other intermediate copy is made.
+
+    Args:
+        surface (pygame.Surface): Surface to view
+
+    Returns:
+        numpy.ndarray: BGRA array, or None for an unsupported pixel format
+    """
+    if (surface.get_bitsize() != 32 or sys.byteorder != "little" or
+            surface.get_masks()[:3] != (0xFF0000, 0xFF00, 0xFF)):
+        return None
+    width, height = surface.get_size()
+    pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint8)
+    return pixels.reshape(height, surface.get_pitch() // 4, 4)[:, :width]
+
 class VideoExporter:
+    """
+    Records frames to an mp4 file.
+
+    capture_frame() only copies the frame and queues it; a dedicated encoder thread
+    converts and writes it, so encoder stalls do not hold up the game loop.
+
+    Video frame k shows the simulation at k / fps seconds. frames_due() says how many
+    frames the current simulation time accounts for, so the video's length follows
+    simulated time no matter how fast the loop actually runs.
+    """
     def __init__(self, width=config.WIDTH, height=config.HEIGHT, fps=config.VIDEO_FPS,
-                 filename_prefix=config.VIDEO_FILENAME_PREFIX, output_dir=config.VIDEO_DIR):
+                 filename_prefix=config.VIDEO_FILENAME_PREFIX, output_dir=config.VIDEO_DIR,
+                 queue_size=ENCODER_QUEUE_SIZE, queue_policy="block"):
 
+        if queue_policy not in QUEUE_FULL_POLICIES:
+            raise ValueError(f"queue_policy must be one of {QUEUE_FULL_POLICIES}, got {queue_policy!r}")
+
+        self._thread = None
         if not OPENCV_AVAILABLE or not config.RECORD_VIDEO:
             self.video_writer = None
             self.enabled = False
@@ -29,6 +80,17 @@ class VideoExporter:
         self.height = height
         self.fps = fps
 
+        # Frame counters and timings for the capture side (game loop) and encode side
+        self.queue_policy = queue_policy
+        self.frame_count = 0
+        self.encoded_frames = 0
+        self.blocked_frames = 0  # captures that had to wait for a full queue
+        self.dropped_frames = 0  # frames discarded because the queue was full
+        self._owed_repeats = 0  # dropped frames not yet replaced by the encoder
+        self.capture_time = 0.0
+        self.encode_time = 0.0
+        self.error = None
+
         # Create video directory if it doesn't exist
         # Ensure the path is relative to the script's directory if needed
         # Assuming exporter.py is in the same dir as main.py
@@ -47,37 +109,138 @@ class VideoExporter:
             self.video_writer = cv2.VideoWriter(self.filename, fourcc, self.fps, (self.width, self.height))
             if not self.video_writer.isOpened():
                 raise IOError(f"Could not open video writer for '{self.filename}'")
+            # Start the encoder thread
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+            self._thread.start()
             print(f"Video recording enabled. Saving to: {self.filename}")
         except Exception as e:
             print(f"Error initializing VideoWriter: {e}")
             self.video_writer = None
             self.enabled = False
 
-    def capture_frame(self, surface):
-        """Captures a frame from the Pygame surface and writes it to the video."""
-        if not self.enabled or self.video_writer is None:
-            return
+    def frames_due(self, sim_time):
+        """
+        Returns how many frames are still owed up to sim_time (seconds since recording started).
+        0 means this step needs neither rendering nor capturing; 2 or more means the
+        frame is repeated.
+        """
+        if not self.enabled:
+            return 0
+        # Small epsilon so float error does not miss a frame that lands exactly on sim_time
+        target = math.floor(sim_time * self.fps + 1e-6) + 1
+        return max(0, target - self.frame_count)
+
+    def capture_frame(self, surface, count=1):
+        """
+        Captures a frame from the Pygame surface and queues it `count` times for the
+        encoder thread. Returns False if any copy was dropped because the queue was full.
+        """
+        if not self.enabled or self._thread is None:
+            return False
 
         try:
-            # Get pixel data from Pygame surface
-            frame_data = pygame.surfarray.array3d(surface)
-            # Pygame uses (width, height, channels), OpenCV uses (height, width, channels)
-            # Pygame uses RGB, OpenCV uses BGR
-            frame_data = frame_data.swapaxes(0, 1) # Transpose width and height
-            frame_data = cv2.cvtColor(frame_data, cv2.COLOR_RGB2BGR) # Convert RGB to BGR
-
-            self.video_writer.write(frame_data)
+            capture_start = time.perf_counter()
+            # The encoder thread writes asynchronously and the screen is redrawn next frame,
+            # so take exactly one copy of the BGRA pixel buffer; the BGRA -> BGR conversion
+            # happens on the encoder thread
+            frame_data = surface_bgra_view(surface)
+            if frame_data is not None:
+                frame_data = frame_data.copy()
+            else:
+                # Other pixel formats: copy via surfarray
+                # Pygame uses (width, height, channels), OpenCV uses (height, width, channels)
+                frame_data = pygame.surfarray.array3d(surface)
+                frame_data = frame_data.swapaxes(0, 1) # Transpose width and height
+                frame_data = cv2.cvtColor(frame_data, cv2.COLOR_RGB2BGRA) # Convert RGB to BGRA
+
+            # Each queue entry is (frame, copies, repeats of the previous frame first).
+            # Dropped frames still advance the video clock: the encoder fills their slots
+            # with the last frame it wrote, so the file has frame_count frames
+            self.frame_count += count
+            queued = True
+            if self.queue_policy == "drop":
+                try:
+                    self._queue.put_nowait((frame_data, count, self._owed_repeats))
+                    self._owed_repeats = 0
+                except queue.Full:
+                    self.dropped_frames += count
+                    self._owed_repeats += count
+                    queued = False
+            else:
+                if self._queue.full():
+                    self.blocked_frames += 1
+                self._queue.put((frame_data, count, 0))
+            self.capture_time += time.perf_counter() - capture_start
+            return queued
         except Exception as e:
             print(f"Error capturing frame: {e}")
-            # Optionally disable further recording on error
-            # self.enabled = False
-            # self.finalize()
+            return False
+
+    def _encode_loop(self):
+        """Encoder thread: takes frames off the queue and writes them to the video."""
+        last_frame = None
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            if self.error is not None:
+                continue # Just drain the queue after an error
+            frame_data, copies, repeats = entry
+            try:
+                encode_start = time.perf_counter()
+                if repeats and last_frame is not None:
+                    # Slots of dropped frames: repeat the previous frame
+                    last_bgr = cv2.cvtColor(last_frame, cv2.COLOR_BGRA2BGR)
+                    for _ in range(repeats):
+                        self.video_writer.write(last_bgr)
+                    self.encoded_frames += repeats
+                if copies:
+                    frame_bgr = cv2.cvtColor(frame_data, cv2.COLOR_BGRA2BGR)
+                    for _ in range(copies):
+                        self.video_writer.write(frame_bgr)
+                    self.encoded_frames += copies
+                    last_frame = frame_data
+                self.encode_time += time.perf_counter() - encode_start
+            except Exception as e:
+                self.error = e
+                print(f"Error encoding frame: {e}")
+
+    def get_stats(self):
+        """Returns frame counts, capture/encode throughput (frames per second of work) and queue counters."""
+        return {
+            "captured_frames": self.frame_count,
+            "encoded_frames": self.encoded_frames,
+            "capture_fps": self.frame_count / self.capture_time if self.capture_time > 0 else 0,
+            "encode_fps": self.encoded_frames / self.encode_time if self.encode_time > 0 else 0,
+            "blocked_frames": self.blocked_frames,
+            "dropped_frames": self.dropped_frames,
+        }
 
     def finalize(self):
-        """Releases the video writer object."""
-        if self.enabled and self.video_writer is not None:
+        """Drains the frame queue, then releases the video writer object.
+        Returns False if encoding failed and the file is incomplete."""
+        if self.enabled and self._thread is not None:
             print(f"Finalizing video export: {self.filename}")
+            # Let the encoder thread write every queued frame (and fill the slots of
+            # frames dropped since the last queued one) before stopping it
+            if self._owed_repeats:
+                self._queue.put((None, 0, self._owed_repeats))
+                self._owed_repeats = 0
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
             self.video_writer.release()
             self.video_writer = None # Ensure it's not used again
+            stats = self.get_stats()
+            print(f"Frames: {stats['captured_frames']} captured, {stats['encoded_frames']} encoded, "
+                  f"{stats['dropped_frames']} dropped, {stats['blocked_frames']} waits on a full queue")
+            print(f"Throughput: capture {stats['capture_fps']:.1f} fps, encode {stats['encode_fps']:.1f} fps")
+            self.enabled = False # Mark as finalized
+            if self.error is not None:
+                print(f"Video export failed, {self.filename} is incomplete: {self.error}")
+                return False
             print("Video export finished.")
+            return True
         self.enabled = False # Mark as finalized
+        return False
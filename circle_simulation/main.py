@@ -1,4 +1,5 @@
 import pygame
+import argparse
 import sys
 import math
 import random
@@ -19,11 +20,13 @@ class Simulation:
         pygame.display.set_caption("Circle Wall Simulation")
         self.clock = pygame.time.Clock()
         self.running = True
-        self.current_angle = 0 # Initial angle of the gap (in degrees for rotation speed)
 
-        # Initialize simulation objects
-        self.balls = []
-        self.circle_wall = physics.CircleWall()
+        # Initialize simulation objects (the engine also keeps the simulated time, which
+        # drives video frame timing, and the gap angle)
+        self.engine = physics.SteppedEngine()
+        self.balls = self.engine.balls
+        self.circle_wall = self.engine.wall
+        self.ball_sprites = renderer.BallSprites()
 
         # Initialize video exporter if enabled
         self.video_exporter = None
@@ -44,9 +47,7 @@ class Simulation:
 
     def add_ball(self, position=None, velocity=None):
         """Adds a new ball to the simulation."""
-        if len(self.balls) < config.MAX_BALLS:
-            new_ball = physics.Ball(position=position, velocity=velocity)
-            self.balls.append(new_ball)
+        self.engine.add_ball(position=position, velocity=velocity)
 
     def run(self):
         """Main simulation loop."""
@@ -55,11 +56,17 @@ class Simulation:
 
             self.handle_events()
             self.update(dt)
-            self.render()
 
-            # Export frame if recording
-            if self.video_exporter and self.video_exporter.enabled:
-                self.video_exporter.capture_frame(self.screen)
+            # While recording, only render the steps that land on a video frame
+            # (every 1 / VIDEO_FPS of simulated time); otherwise render every step
+            recording = self.video_exporter is not None and self.video_exporter.enabled
+            frames_due = self.video_exporter.frames_due(self.engine.time) if recording else 0
+            if frames_due or not recording:
+                self.render()
+
+            # Export frame if recording (repeated if the step covered several video frames)
+            if frames_due:
+                self.video_exporter.capture_frame(self.screen, frames_due)
 
             # Check for exit condition (e.g., max balls reached or exceeded)
             # Use >= just in case multiple balls escape simultaneously pushing count over limit
@@ -79,50 +86,9 @@ class Simulation:
                     self.running = False
 
     def update(self, dt):
-        """Updates the state of the simulation."""
-        # Update circle wall rotation (using degrees for easy speed control)
-        self.current_angle += config.ROTATION_SPEED_DEGREES_PER_SEC * dt
-        self.current_angle %= 360 # Keep angle between 0 and 360
-
-        # Update balls and handle collisions/escapes
-        balls_to_remove = []
-        new_balls_needed = 0
-        # Convert current angle to normalized radians for physics calculations
-        current_rotation_rad = (math.radians(self.current_angle) + 2 * math.pi) % (2 * math.pi)
-
-        # Use a copy of the list for iteration as we modify the original list
-        for ball in self.balls[:]:
-            ball.update(dt)
-            # Pass current rotation in radians to collide_ball
-            self.circle_wall.collide_ball(ball, current_rotation_rad)
-
-            # Check if the ball went off-screen AFTER collision handling
-            if ball.is_off_screen():
-                 if ball not in balls_to_remove: # Avoid adding the same ball twice
-                    balls_to_remove.append(ball)
-                    new_balls_needed += 2 # Increment needed balls for each removed ball
-
-        # Remove off-screen balls
-        for ball in balls_to_remove:
-            if ball in self.balls: # Check if it wasn't already removed (e.g., by reaching max limit)
-                self.balls.remove(ball)
-
-        # Add new balls for each one that went off-screen, respecting the limit
-        for _ in range(new_balls_needed):
-            # Check limit inside the loop as balls are added
-            if len(self.balls) < config.MAX_BALLS:
-                self.add_ball()
-            else:
-                break # Stop adding if limit is reached
-
-        # Placeholder: Handle ball-ball collisions (Simple pairwise check for now)
-        # This is computationally expensive (O(n^2)) and needs optimization for large N
-        # For now, let's skip complex collision resolution between balls
-        # for i in range(len(self.balls)):
-        #     for j in range(i + 1, len(self.balls)):
-        #         ball_a = self.balls[i]
-        #         ball_b = self.balls[j]
-        #         # physics.handle_ball_collision(ball_a, ball_b) # Needs implementation
+        """Updates the state of the simulation (rotation, movement, wall and ball-ball
+        collisions, escapes) through the same engine sweep.py runs headless."""
+        self.engine.step(dt)
 
     def render(self):
         """Renders the current state to the screen."""
@@ -130,12 +96,10 @@ class Simulation:
 
         # Render circle wall using the method from the physics object
         # Pass the current rotation angle in radians
-        current_rotation_rad = (math.radians(self.current_angle) + 2 * math.pi) % (2 * math.pi)
-        self.circle_wall.draw(self.screen, current_rotation_rad)
+        self.circle_wall.draw(self.screen, self.engine.rotation_rad())
 
-        # Render balls
-        for ball in self.balls:
-            renderer.draw_ball(self.screen, ball)
+        # Render balls (pre-rasterized sprites, batched into one blit call)
+        self.ball_sprites.draw(self.screen, self.balls)
 
         # Render ball count
         renderer.draw_ball_count(self.screen, len(self.balls))
@@ -151,7 +115,54 @@ class Simulation:
         pygame.quit()
         print("Simulation finished.")
 
+def time_to_max_balls(seed=None, until=float("inf"), idealized=False):
+    """Computes without rendering when the ball count reaches MAX_BALLS. Returns None if it
+    is not reached within until simulated seconds.
+
+    By default this steps the same physics main.py renders (SteppedEngine at a fixed
+    1 / FPS), so the time carries over to the rendered run. With idealized=True it uses
+    the event-driven EscapeEngine instead: much faster, but an idealized model with no
+    ball-ball collisions and no pull-back into the circle, so its escapes come earlier
+    and more often than in main.py."""
+    if seed is not None:
+        random.seed(seed)
+    if idealized:
+        engine = physics.EscapeEngine()
+    else:
+        engine = physics.SteppedEngine()
+    for _ in range(config.INITIAL_BALLS):
+        engine.add_ball()
+    reached = engine.run(until=until)
+    if idealized:
+        print("Idealized event-driven model (no ball-ball collisions, no pull-back into the "
+              "circle); does not match the rendered simulation.")
+        print(f"Events: {engine.processed} (bounces: {engine.bounces}, escapes: {engine.escapes})")
+    else:
+        print(f"Steps: {engine.steps} (escapes: {engine.escapes})")
+    if reached is None:
+        print(f"MAX_BALLS ({config.MAX_BALLS}) not reached; {len(engine)} balls at {engine.time:.2f}s.")
+    else:
+        print(f"Reached MAX_BALLS ({config.MAX_BALLS}) after {reached:.2f}s of simulated time.")
+    return reached
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Circle Wall Simulation")
+    parser.add_argument("--time-to-max", action="store_true",
+                        help="Compute how long it takes to reach MAX_BALLS (same physics as the "
+                             "rendered run, no window)")
+    parser.add_argument("--idealized", action="store_true",
+                        help="With --time-to-max, use the event-driven idealized model instead "
+                             "(much faster; no ball-ball collisions, so it does not match the "
+                             "rendered run)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--until", type=float, default=float("inf"),
+                        help="Simulated-time limit for --time-to-max, in seconds")
+    args = parser.parse_args()
+    if args.time_to_max:
+        time_to_max_balls(args.seed, args.until, args.idealized)
+        sys.exit()
+    if args.seed is not None:
+        random.seed(args.seed)
     simulation = Simulation()
     simulation.run()
     sys.exit()
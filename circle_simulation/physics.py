@@ -1,6 +1,8 @@
 import pygame
 import math
+import heapq
 import random
+import numpy as np
 import config
 
 class Ball:
@@ -42,15 +44,210 @@ class Ball:
                 self.pos.y + self.radius < 0 or
                 self.pos.y - self.radius > height)
 
+class BallArray:
+    """Struct-of-arrays store for all balls.
+
+    Positions, velocities, radii and colour indices live in contiguous NumPy arrays so
+    integration, wall collisions, the gap test and off-screen culling run as whole-array
+    operations. Removed slots go on a free-list and are reused by later spawns, so
+    removal is O(1) per ball and the arrays only grow when every slot is in use.
+    """
+    def __init__(self, capacity=64):
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.radius = np.zeros(capacity)
+        self.color_index = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.palette = list(config.BALL_COLORS)
+        self.free = [] # Released slots below the high-water mark
+        self.used = 0 # High-water mark: slots at or above this were never used
+        self.count = 0
+        self.pair_tests = 0
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        """Doubles the capacity of every array."""
+        capacity = max(1, len(self.alive)) * 2
+        for name in ("pos", "vel", "radius", "color_index", "alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, position=None, velocity=None, radius=config.BALL_RADIUS, color=None):
+        """Adds a ball (same defaults and random draws as Ball) and returns its slot."""
+        if color is None:
+            color = random.choice(config.BALL_COLORS)
+        color = tuple(color)
+        if color not in self.palette:
+            self.palette.append(color)
+
+        if position is None:
+            # Start near the center, avoiding the exact center
+            angle = random.uniform(0, 2 * math.pi)
+            dist = random.uniform(0, config.CIRCLE_RADIUS * 0.1)
+            position = (config.CIRCLE_CENTER[0] + dist * math.cos(angle),
+                        config.CIRCLE_CENTER[1] + dist * math.sin(angle))
+
+        if velocity is None:
+            # Random initial velocity
+            angle = random.uniform(0, 2 * math.pi)
+            velocity = (math.cos(angle) * config.BALL_SPEED, math.sin(angle) * config.BALL_SPEED)
+
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.used == len(self.alive):
+                self._grow()
+            slot = self.used
+            self.used += 1
+
+        self.pos[slot] = position
+        self.vel[slot] = velocity
+        self.radius[slot] = radius
+        self.color_index[slot] = self.palette.index(color)
+        self.alive[slot] = True
+        self.count += 1
+        return slot
+
+    def remove(self, mask):
+        """Removes the balls selected by a boolean mask over all slots."""
+        slots = np.flatnonzero(mask & self.alive)
+        self.alive[slots] = False
+        self.vel[slots] = 0 # Dead slots stay put during whole-array integration
+        self.free.extend(slots.tolist())
+        self.count -= len(slots)
+        return len(slots)
+
+    def indices(self):
+        """Slots of the live balls."""
+        return np.flatnonzero(self.alive[:self.used])
+
+    def colors(self, slots):
+        """RGB colours of the given slots."""
+        return [self.palette[i] for i in self.color_index[slots]]
+
+    def update(self, dt):
+        """Moves every ball by its velocity (same scaling as Ball.update)."""
+        self.pos[:self.used] += self.vel[:self.used] * (dt * 100)
+
+    def off_screen(self, width=config.WIDTH, height=config.HEIGHT):
+        """Boolean mask of live balls that are completely outside the screen."""
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        return self.alive & ((x + self.radius < 0) | (x - self.radius > width) |
+                             (y + self.radius < 0) | (y - self.radius > height))
+
+    def overlapping_pairs(self):
+        """Returns the slot pairs (i, j) of overlapping live balls.
+
+        Uniform-grid broad phase, vectorized: with cells at least one diameter wide, two
+        balls can only touch if they share a cell or sit in neighbouring cells. Balls are
+        sorted by cell key and the ranges of the same and half of the neighbouring cells
+        are found with searchsorted, so each frame costs O(n log n) instead of checking
+        every pair. The number of candidate pairs tested is stored in pair_tests.
+        """
+        slots = self.indices()
+        empty = np.zeros(0, dtype=np.int64)
+        self.pair_tests = 0
+        if len(slots) < 2:
+            return empty, empty
+
+        # Cells at least one diameter wide, so touching balls are always in adjacent cells
+        pos = self.pos[slots]
+        cell_size = 2 * max(config.BALL_RADIUS, float(self.radius[slots].max()))
+        cell_x = np.floor(pos[:, 0] / cell_size).astype(np.int64)
+        cell_y = np.floor(pos[:, 1] / cell_size).astype(np.int64)
+        cell_x -= cell_x.min()
+        cell_y -= cell_y.min() - 1 # Keep cell_y - 1 non-negative too
+        row = int(cell_y.max()) + 2
+        keys = cell_x * row + cell_y
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        positions = np.arange(len(slots))
+
+        # Later balls in the same cell, plus half of the neighbouring cells
+        ranges = [(positions + 1, np.searchsorted(sorted_keys, sorted_keys, side="right"))]
+        for offset in (row - 1, row, row + 1, 1):
+            target = sorted_keys + offset
+            ranges.append((np.searchsorted(sorted_keys, target, side="left"),
+                           np.searchsorted(sorted_keys, target, side="right")))
+
+        first, second = [], []
+        for start, stop in ranges:
+            counts = np.maximum(stop - start, 0)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # Expand each ball's candidate range [start, stop) into pairs
+            owner = np.repeat(positions, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            first.append(order[owner])
+            second.append(order[np.repeat(start, counts) + offsets])
+
+        if not first:
+            return empty, empty
+        i = slots[np.concatenate(first)]
+        j = slots[np.concatenate(second)]
+        self.pair_tests = len(i)
+
+        offset = self.pos[j] - self.pos[i]
+        min_dist = self.radius[i] + self.radius[j]
+        hit = (offset * offset).sum(axis=1) < min_dist * min_dist
+        return i[hit], j[hit]
+
+    def collide(self):
+        """Resolves all ball-ball collisions at once: overlapping balls are separated and
+        get an elastic response, with mass taken as proportional to radius squared.
+        Corrections from several contacts on one ball are summed. Returns the number of pairs."""
+        i, j = self.overlapping_pairs()
+        if len(i) == 0:
+            return 0
+
+        offset = self.pos[j] - self.pos[i]
+        dist = np.sqrt((offset * offset).sum(axis=1))
+        # Spawned on exactly the same spot: push apart in a random direction
+        coincident = dist < 1e-6
+        if coincident.any():
+            angles = np.array([random.uniform(0, 2 * math.pi) for _ in range(int(coincident.sum()))])
+            offset[coincident] = np.column_stack([np.cos(angles), np.sin(angles)])
+        normal = offset / np.where(coincident, 1.0, dist)[:, None]
+
+        inv_mass_i = 1 / (self.radius[i] ** 2)
+        inv_mass_j = 1 / (self.radius[j] ** 2)
+        inv_mass_sum = inv_mass_i + inv_mass_j
+
+        # Resolve the overlap, moving each ball in proportion to its inverse mass
+        correction = normal * (((self.radius[i] + self.radius[j]) - dist) / inv_mass_sum)[:, None]
+        np.add.at(self.pos, i, -correction * inv_mass_i[:, None])
+        np.add.at(self.pos, j, correction * inv_mass_j[:, None])
+
+        # Exchange momentum along the normal only for approaching pairs
+        approach_speed = ((self.vel[i] - self.vel[j]) * normal).sum(axis=1)
+        impulse = normal * (np.maximum(approach_speed, 0) * 2 / inv_mass_sum)[:, None]
+        np.add.at(self.vel, i, -impulse * inv_mass_i[:, None])
+        np.add.at(self.vel, j, impulse * inv_mass_j[:, None])
+        return len(i)
+
+# Angle between the pre-rendered wall rotations used by CircleWall.draw. A smaller step
+# follows the rotation more closely but keeps more ring surfaces in memory
+WALL_ROTATION_STEP_DEGREES = 1.0
+
 class CircleWall:
     def __init__(self, center=config.CIRCLE_CENTER, radius=config.CIRCLE_RADIUS,
-                 thickness=config.CIRCLE_THICKNESS, gap_angle_degrees=config.GAP_ANGLE_DEGREES):
+                 thickness=config.CIRCLE_THICKNESS, gap_angle_degrees=config.GAP_ANGLE_DEGREES,
+                 rotation_step_degrees=WALL_ROTATION_STEP_DEGREES):
         self.center = pygame.Vector2(center)
         self.radius = radius
         self.thickness = thickness
         self.gap_angle_rad = math.radians(gap_angle_degrees) # Store gap size in radians
         self.half_gap_rad = self.gap_angle_rad / 2
         # Collision primarily happens at self.radius
+        self.rotation_step_rad = math.radians(rotation_step_degrees)
+        self.ring_cache = {} # Quantized rotation step -> pre-rendered ring surface
+        self._ring_pixels = None # (band mask, pixel angles), shared by every rotation
 
     def _get_gap_boundaries(self, current_rotation_rad):
         """Calculates the start and end angles of the gap in radians [0, 2*pi),
@@ -123,40 +320,288 @@ class CircleWall:
         # No collision detected with the solid wall part
         return False
 
+    def is_inside_gap_array(self, angles_rad, current_rotation_rad):
+        """Vectorized is_inside_gap: the gap boundaries are computed once for all angles."""
+        start_gap_rad, end_gap_rad = self._get_gap_boundaries(current_rotation_rad)
+        norm_angles_rad = np.mod(angles_rad, 2 * math.pi)
+        if start_gap_rad < end_gap_rad: # Gap does not wrap around 0 radians
+            return (norm_angles_rad > start_gap_rad) & (norm_angles_rad < end_gap_rad)
+        return (norm_angles_rad > start_gap_rad) | (norm_angles_rad < end_gap_rad)
+
+    def collide_balls(self, balls, current_rotation_rad):
+        """Vectorized collide_ball for every live ball in a BallArray.
+        Returns a boolean mask of the balls that hit the solid part of the wall."""
+        vec_to_ball = balls.pos - (self.center.x, self.center.y)
+        dist_from_center = np.sqrt((vec_to_ball * vec_to_ball).sum(axis=1))
+
+        # Balls whose outer edge reached the wall (ignoring ones at the exact center)
+        touching = balls.alive & (dist_from_center >= 1e-6) & \
+                   (dist_from_center + balls.radius >= self.radius)
+        touching_slots = np.flatnonzero(touching)
+        if len(touching_slots) == 0:
+            return touching
+
+        # Angle with atan2(-y, x) for the Pygame convention; balls in the gap pass through
+        ball_angle_rad = np.arctan2(-vec_to_ball[touching_slots, 1], vec_to_ball[touching_slots, 0])
+        slots = touching_slots[~self.is_inside_gap_array(ball_angle_rad, current_rotation_rad)]
+        hit = np.zeros_like(touching)
+
+        # Move penetrating balls back along the normal so their edge sits on the wall
+        penetration = dist_from_center[slots] + balls.radius[slots] - self.radius
+        slots = slots[penetration > 0]
+        penetration = penetration[penetration > 0]
+        normal = vec_to_ball[slots] / dist_from_center[slots, None]
+        balls.pos[slots] -= normal * penetration[:, None]
+        hit[slots] = True
+
+        # Reflect velocity radially only if moving towards the wall
+        vel_dot_normal = (balls.vel[slots] * normal).sum(axis=1)
+        toward = vel_dot_normal > 0
+        balls.vel[slots[toward]] -= 2 * vel_dot_normal[toward, None] * normal[toward]
+        return hit
+
+    def ring_surface(self, rotation_step):
+        """Returns the wall pre-rendered at rotation_step * rotation_step_rad, building it
+        on first use. The ring is rasterized from a per-pixel distance and angle mask (same
+        gap test as the collisions), so thick walls have no moire gaps. Surfaces are 8-bit
+        and colour-keyed, about (2 * radius + 1) ** 2 bytes each."""
+        ring = self.ring_cache.get(rotation_step)
+        if ring is not None:
+            return ring
+
+        radius = int(self.radius)
+        thickness = min(max(1, int(self.thickness)), radius)
+        if self._ring_pixels is None:
+            # Distance and angle (Pygame convention) of every pixel from the centre, (x, y) order
+            offsets = np.arange(-radius, radius + 1)
+            dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+            band = (np.hypot(dx, dy) <= radius) & (np.hypot(dx, dy) > radius - thickness)
+            self._ring_pixels = (band, np.arctan2(-dy, dx))
+        band, angles = self._ring_pixels
+
+        solid = band & ~self.is_inside_gap_array(angles, rotation_step * self.rotation_step_rad)
+        ring = pygame.Surface((2 * radius + 1, 2 * radius + 1), 0, 8)
+        ring.set_palette([config.BLACK, config.WHITE] + [config.BLACK] * 254)
+        pygame.surfarray.blit_array(ring, solid.astype(np.uint8))
+        ring.set_colorkey(config.BLACK, pygame.RLEACCEL)
+        self.ring_cache[rotation_step] = ring
+        return ring
+
     def draw(self, surface, current_rotation_rad): # Changed parameter to radians
-        """Draws the rotating circle wall with a gap, consistent with collision logic."""
-        center_x, center_y = int(self.center.x), int(self.center.y)
+        """Draws the rotating circle wall with a gap as a single blit of a cached ring.
+        The rotation is rounded to the nearest rotation_step_rad for drawing only;
+        collisions use the exact angle."""
+        steps = max(1, round(2 * math.pi / self.rotation_step_rad))
+        rotation_step = round(current_rotation_rad / self.rotation_step_rad) % steps
         radius = int(self.radius)
-        # Use a thickness consistent with config, ensure it's an int
-        thickness = max(1, int(config.CIRCLE_THICKNESS)) # Ensure thickness is at least 1
-
-        # Calculate gap boundaries in radians using the same helper function as collision detection
-        gap_start_angle_rad, gap_end_angle_rad = self._get_gap_boundaries(current_rotation_rad)
-
-        # Define the bounding rectangle for the arc drawing
-        # Make radius slightly larger for drawing to encompass the collision radius visually
-        draw_radius = radius
-        rect = pygame.Rect(center_x - draw_radius, center_y - draw_radius, 2 * draw_radius, 2 * draw_radius)
-
-        # Draw the solid part of the wall using pygame.draw.arc
-        # Pygame angles: 0 is right (positive x-axis), increases counter-clockwise.
-        # We need to draw the arc segment *excluding* the gap.
-        # Draw from the end of the gap angle to the start of the gap angle (counter-clockwise).
-        draw_start_rad = gap_end_angle_rad
-        draw_end_rad = gap_start_angle_rad
-
-        # Ensure thickness is valid for pygame.draw.arc (must be <= radius)
-        draw_thickness = min(thickness, draw_radius)
-        if draw_thickness <= 0: draw_thickness = 1 # Minimum thickness of 1
-
-        try:
-            # Handle the case where the solid arc crosses the 0 angle
-            if draw_start_rad > draw_end_rad:
-                 # Draw in two parts
-                 pygame.draw.arc(surface, config.WHITE, rect, draw_start_rad, 2 * math.pi, draw_thickness)
-                 pygame.draw.arc(surface, config.WHITE, rect, 0, draw_end_rad, draw_thickness)
-            elif abs(draw_start_rad - draw_end_rad) > 1e-6: # Normal case, ensure angles are different
-                 pygame.draw.arc(surface, config.WHITE, rect, draw_start_rad, draw_end_rad, draw_thickness)
-            # If draw_start is very close to draw_end (gap is ~360 deg), draw nothing.
-        except ValueError as e:
-            print(f"Error drawing arc: {e}, rect={rect}, start={draw_start_rad}, end={draw_end_rad}, thickness={draw_thickness}")
+        surface.blit(self.ring_surface(rotation_step),
+                     (int(self.center.x) - radius, int(self.center.y) - radius))
+
+class EscapeEngine:
+    """Idealized event-driven model of the ball and rotating-wall simulation.
+
+    Between wall contacts a ball moves in a straight line and the gap turns at a constant
+    rate, so each ball's next contact with the wall, and whether the gap is over the
+    contact point at that moment, can be computed exactly. Every ball has one pending
+    event in a heap, and the engine jumps from event to event instead of stepping every
+    frame, so nothing tunnels and the cost is O(log n) per event.
+
+    Balls do not collide with each other here, and a ball that reaches the wall inside
+    the gap is free: it leaves on a straight line and is replaced by two new balls (up
+    to max_balls) once it is completely off-screen, as Simulation.update does. The
+    stepped simulation instead pulls a ball outside the circle back in if the gap turns
+    away before it leaves the screen, so escapes come earlier and more often here; use
+    SteppedEngine for times that carry over to main.py.
+    """
+    BOUNCE = 0
+    EXIT = 1
+
+    def __init__(self, wall=None, rotation_speed_degrees=config.ROTATION_SPEED_DEGREES_PER_SEC,
+                 initial_rotation_rad=0.0, max_balls=config.MAX_BALLS,
+                 width=config.WIDTH, height=config.HEIGHT, ball_speed=config.BALL_SPEED):
+        self.wall = wall if wall is not None else CircleWall()
+        self.angular_speed = math.radians(rotation_speed_degrees)
+        self.initial_rotation_rad = initial_rotation_rad
+        self.max_balls = max_balls
+        self.width = width
+        self.height = height
+        self.ball_speed = ball_speed
+        self.time = 0.0
+        self.balls = {} # id -> (ball, time its pos/vel refer to)
+        self.events = [] # Heap of (time, sequence, ball id, kind)
+        self.next_id = 0
+        self.scheduled = 0 # Tie-breaker so simultaneous events pop in scheduling order
+        self.processed = 0
+        self.bounces = 0
+        self.escapes = 0
+        self.escape_times = [] # Simulated time of every exit, in order
+
+    def __len__(self):
+        return len(self.balls)
+
+    def rotation_at(self, time):
+        """Gap rotation (radians, Pygame convention) at the given simulated time."""
+        return (self.initial_rotation_rad + self.angular_speed * time) % (2 * math.pi)
+
+    def add_ball(self, position=None, velocity=None):
+        """Adds a ball (Ball defaults) at the current time and schedules its first event."""
+        if len(self.balls) >= self.max_balls:
+            return None
+        ball = Ball(position=position, velocity=velocity)
+        if velocity is None and self.ball_speed != config.BALL_SPEED:
+            ball.vel.scale_to_length(self.ball_speed) # Same random direction, other speed
+        ball_id = self.next_id
+        self.next_id += 1
+        self.balls[ball_id] = (ball, self.time)
+        self._schedule(ball_id)
+        return ball_id
+
+    def _schedule(self, ball_id):
+        """Pushes the ball's next event: its next wall contact, or leaving the screen."""
+        ball, start = self.balls[ball_id]
+        offset = ball.pos - self.wall.center
+        velocity = ball.vel * 100 # Same scaling as Ball.update
+        speed_sq = velocity.length_squared()
+        if speed_sq == 0:
+            return # Never moves, never hits anything
+        contact_radius = self.wall.radius - ball.radius
+        # |offset + velocity * t| = contact_radius; the ball starts inside, so take the later root
+        b = offset.dot(velocity)
+        c = offset.length_squared() - contact_radius * contact_radius
+        t = (-b + math.sqrt(max(b * b - speed_sq * c, 0.0))) / speed_sq
+        contact = offset + velocity * t
+        angle = math.atan2(-contact.y, contact.x)
+        if self.wall.is_inside_gap(angle, self.rotation_at(start + t)):
+            t = self._exit_time(ball.pos + velocity * t, velocity, ball.radius) + t
+            kind = self.EXIT
+        else:
+            kind = self.BOUNCE
+        heapq.heappush(self.events, (start + t, self.scheduled, ball_id, kind))
+        self.scheduled += 1
+
+    def _exit_time(self, position, velocity, radius):
+        """Time until a ball moving from position is completely off-screen (see Ball.is_off_screen)."""
+        times = []
+        for pos, vel, size in ((position.x, velocity.x, self.width), (position.y, velocity.y, self.height)):
+            if vel < 0:
+                times.append((-radius - pos) / vel)
+            elif vel > 0:
+                times.append((size + radius - pos) / vel)
+        return max(0.0, min(times))
+
+    def step(self):
+        """Processes the next event. Returns False when no events are left."""
+        if not self.events:
+            return False
+        self.time, _, ball_id, kind = heapq.heappop(self.events)
+        self.processed += 1
+        ball, start = self.balls[ball_id]
+        ball.pos += ball.vel * ((self.time - start) * 100)
+
+        if kind == self.BOUNCE:
+            # Reflect off the wall (normal points outward from the centre)
+            normal = (ball.pos - self.wall.center).normalize()
+            ball.vel = ball.vel.reflect(normal)
+            self.balls[ball_id] = (ball, self.time)
+            self.bounces += 1
+            self._schedule(ball_id)
+        else:
+            # Escaped and off-screen: replace it with two new balls
+            del self.balls[ball_id]
+            self.escapes += 1
+            self.escape_times.append(self.time)
+            for _ in range(2):
+                self.add_ball()
+        return True
+
+    def run(self, until=math.inf, max_events=math.inf):
+        """Processes events until max_balls is reached, the next event is later than
+        until, or max_events events were processed. Returns the time max_balls was
+        reached, or None."""
+        processed = 0
+        while len(self.balls) < self.max_balls and processed < max_events:
+            if not self.events or self.events[0][0] > until:
+                return None
+            self.step()
+            processed += 1
+        if len(self.balls) >= self.max_balls:
+            return self.time
+        return None
+
+class SteppedEngine:
+    """Headless fixed-step version of the simulation main.py renders.
+
+    step() runs the same per-frame physics as Simulation.update, which delegates to it:
+    move every ball, collide with the rotating wall (balls outside the circle are pulled
+    back in once the gap turns away), remove off-screen balls and add two new ones per
+    escape, then resolve ball-ball collisions. With the same seed and the same dt
+    sequence the two produce identical runs, so times measured here carry over to main.py.
+    """
+    def __init__(self, wall=None, rotation_speed_degrees=config.ROTATION_SPEED_DEGREES_PER_SEC,
+                 max_balls=config.MAX_BALLS, ball_speed=config.BALL_SPEED):
+        self.balls = BallArray()
+        self.wall = wall if wall is not None else CircleWall()
+        self.rotation_speed_degrees = rotation_speed_degrees
+        self.max_balls = max_balls
+        self.ball_speed = ball_speed
+        self.time = 0.0 # Simulated seconds since start
+        self.current_angle = 0 # Angle of the gap, in degrees
+        self.steps = 0
+        self.escapes = 0
+        self.escape_times = [] # Simulated time of every escape, in order
+
+    def __len__(self):
+        return len(self.balls)
+
+    def rotation_rad(self):
+        """Current gap rotation, normalized radians (Pygame convention)."""
+        return (math.radians(self.current_angle) + 2 * math.pi) % (2 * math.pi)
+
+    def add_ball(self, position=None, velocity=None):
+        """Adds a ball (BallArray defaults) unless max_balls is reached. Returns its slot or None."""
+        if len(self.balls) >= self.max_balls:
+            return None
+        slot = self.balls.add(position=position, velocity=velocity)
+        if velocity is None and self.ball_speed != config.BALL_SPEED:
+            # Same random direction, other speed
+            speed = math.hypot(*self.balls.vel[slot])
+            if speed > 0:
+                self.balls.vel[slot] *= self.ball_speed / speed
+        return slot
+
+    def step(self, dt):
+        """Advances the simulation by dt seconds. Returns the number of balls that escaped."""
+        self.time += dt
+        self.steps += 1
+
+        # Update circle wall rotation (using degrees for easy speed control)
+        self.current_angle += self.rotation_speed_degrees * dt
+        self.current_angle %= 360 # Keep angle between 0 and 360
+
+        # Move every ball, then handle wall collisions and escapes as whole-array operations
+        self.balls.update(dt)
+        self.wall.collide_balls(self.balls, self.rotation_rad())
+
+        # Remove balls that went off-screen AFTER collision handling
+        removed = self.balls.remove(self.balls.off_screen())
+        self.escapes += removed
+        self.escape_times.extend([self.time] * removed)
+
+        # Add two new balls for each one that went off-screen, respecting the limit
+        for _ in range(removed * 2):
+            if self.add_ball() is None:
+                break # Stop adding if limit is reached
+
+        # Handle ball-ball collisions (elastic, with overlap resolution for balls
+        # spawned on top of each other); the grid broad phase keeps this O(n)
+        self.balls.collide()
+        return removed
+
+    def run(self, until=math.inf, dt=1.0 / config.FPS):
+        """Steps by dt until max_balls is reached or until seconds have been simulated.
+        Returns the time max_balls was reached, or None."""
+        while len(self.balls) < self.max_balls:
+            if self.time >= until:
+                return None
+            self.step(dt)
+        return self.time
@@ -1,4 +1,5 @@
 import pygame
+import pygame.gfxdraw
 import math
 import config
 
@@ -9,12 +10,77 @@ try:
 except:
     FONT = pygame.font.Font(None, 30) # Fallback font
 
+# Ball sprites are drawn with antialiased edges when enabled (alpha-blended, so slower)
+BALL_ANTIALIAS = False
+
 # draw_circle_wall function is removed as it's now part of the CircleWall class in physics.py
 
 def draw_ball(surface, ball):
     """Draws a single ball."""
     pygame.draw.circle(surface, ball.color, (int(ball.pos.x), int(ball.pos.y)), ball.radius)
 
+def draw_balls(surface, balls):
+    """Draws every live ball in a BallArray."""
+    slots = balls.indices()
+    for (x, y), radius, color in zip(balls.pos[slots].astype(int).tolist(),
+                                     balls.radius[slots].tolist(), balls.colors(slots)):
+        pygame.draw.circle(surface, color, (x, y), radius)
+
+class BallSprites:
+    """
+    Draws a BallArray from pre-rasterized sprites instead of one pygame.draw.circle per ball.
+
+    One sprite is rendered per (colour, radius) the first time it is needed, and every
+    ball is then submitted in a single Surface.blits call. Without antialiasing the
+    sprites are colour-keyed copies of pygame.draw.circle, so the output is pixel-identical
+    to draw_balls.
+    """
+    def __init__(self, antialias=BALL_ANTIALIAS):
+        self.antialias = antialias
+        self.sprites = {} # (color, radius) -> Surface
+
+    def sprite(self, color, radius):
+        """Returns the cached sprite for a colour and radius; its centre is at (r, r)."""
+        key = (color, radius)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            return sprite
+
+        r = int(radius)
+        size = (2 * r + 1, 2 * r + 1)
+        if self.antialias:
+            sprite = pygame.Surface(size, pygame.SRCALPHA)
+            pygame.gfxdraw.filled_circle(sprite, r, r, r, color)
+            pygame.gfxdraw.aacircle(sprite, r, r, r, color)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+        else:
+            sprite = pygame.Surface(size)
+            # Any colour other than the ball's own works as the transparent key
+            colorkey = config.BLACK if tuple(color) != tuple(config.BLACK) else config.WHITE
+            sprite.fill(colorkey)
+            pygame.draw.circle(sprite, color, (r, r), radius)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert()
+            sprite.set_colorkey(colorkey, pygame.RLEACCEL)
+        self.sprites[key] = sprite
+        return sprite
+
+    def draw(self, surface, balls):
+        """Draws every live ball in a BallArray."""
+        slots = balls.indices()
+        if len(slots) == 0:
+            return
+        color_index = balls.color_index[slots].tolist()
+        radius = balls.radius[slots].tolist()
+        # Top-left corner of each sprite (truncated like the int() in draw_ball)
+        corners = (balls.pos[slots].astype(int) -
+                   balls.radius[slots].astype(int)[:, None]).tolist()
+        sprites = {key: self.sprite(balls.palette[key[0]], key[1])
+                   for key in set(zip(color_index, radius))}
+        surface.blits([(sprites[c, r], corner)
+                       for c, r, corner in zip(color_index, radius, corners)], doreturn=False)
+
 def draw_ball_count(surface, count):
     """Draws the current ball count on the screen."""
     text_surface = FONT.render(f"Balls: {count}", True, config.WHITE)
@@ -0,0 +1,187 @@
+"""
+Headless parameter sweep.
+
+Runs seeded, unrendered simulations over a grid (or a random sample) of
+GAP_ANGLE_DEGREES, ROTATION_SPEED_DEGREES_PER_SEC, BALL_SPEED and INITIAL_BALLS,
+spread across a process pool. Writes two CSV tables:
+
+    <out>_summary.csv  one row per configuration: time to MAX_BALLS over the seeds
+    <out>_curves.csv   escapes per second in fixed time bins, averaged over the seeds
+
+and prints the configurations closest to the target time.
+
+Each run is physics.SteppedEngine, the same per-frame physics main.py renders
+(ball-ball collisions, and balls pulled back inside when the gap turns away before
+they leave the screen), stepped at a fixed 1 / FPS. A run with a given seed matches
+main.py --seed exactly as long as main.py keeps up with FPS; when frames run long,
+main.py takes larger steps and individual runs diverge, but the times over several
+seeds still carry over. Copy the values you pick into config.py and run main.py to
+render them.
+
+Usage:
+    python sweep.py --gap 30 40 50 --rotation 45 60 90 --seeds 8
+    python sweep.py --gap 20 60 --rotation 30 120 --speed 2 5 --random 200 --target 60
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# The sweep never draws, but physics imports pygame; keep it from opening a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import config
+import physics
+
+PARAMETERS = ("gap", "rotation", "speed", "initial")
+
+
+def run_simulation(task):
+    """Runs one seeded configuration to MAX_BALLS (or the time limit) in a worker process."""
+    params, seed, max_balls, until = task
+    random.seed(seed)
+    engine = physics.SteppedEngine(
+        wall=physics.CircleWall(gap_angle_degrees=params["gap"]),
+        rotation_speed_degrees=params["rotation"],
+        max_balls=max_balls,
+        ball_speed=params["speed"],
+    )
+    for _ in range(params["initial"]):
+        engine.add_ball()
+    reached = engine.run(until=until, dt=1.0 / config.FPS)
+    return params, seed, reached, engine.escape_times, engine.steps
+
+
+def grid_configs(values):
+    """Every combination of the given parameter values."""
+    return [dict(zip(PARAMETERS, combo)) for combo in itertools.product(*(values[p] for p in PARAMETERS))]
+
+
+def random_configs(values, count, seed):
+    """count configurations drawn uniformly between each parameter's smallest and largest value."""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(count):
+        params = {p: rng.uniform(min(values[p]), max(values[p])) for p in ("gap", "rotation", "speed")}
+        params = {p: round(v, 2) for p, v in params.items()}
+        params["initial"] = rng.randint(min(values["initial"]), max(values["initial"]))
+        configs.append(params)
+    return configs
+
+
+def escape_curve(escape_times, until, bin_seconds):
+    """Escapes per second in each bin of bin_seconds up to until."""
+    bins = [0] * math.ceil(until / bin_seconds)
+    for t in escape_times:
+        index = int(t // bin_seconds)
+        if index < len(bins):
+            bins[index] += 1
+    return [count / bin_seconds for count in bins]
+
+
+def sweep(configs, seeds, max_balls, until, bin_seconds, workers):
+    """Runs every configuration with every seed and aggregates the results per configuration."""
+    tasks = [(params, seed, max_balls, until) for params in configs for seed in range(seeds)]
+    runs = {}
+    steps = 0
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for params, seed, reached, escape_times, run_steps in pool.map(run_simulation, tasks,
+                                                                       chunksize=chunksize):
+            key = tuple(params[p] for p in PARAMETERS)
+            runs.setdefault(key, []).append((reached, escape_times))
+            steps += run_steps
+
+    results = []
+    for key, seed_runs in runs.items():
+        times = [reached for reached, _ in seed_runs if reached is not None]
+        curves = [escape_curve(escape_times, until, bin_seconds) for _, escape_times in seed_runs]
+        results.append({
+            **dict(zip(PARAMETERS, key)),
+            "reached": len(times),
+            "runs": len(seed_runs),
+            "median": statistics.median(times) if times else None,
+            "mean": statistics.fmean(times) if times else None,
+            "min": min(times) if times else None,
+            "max": max(times) if times else None,
+            "curve": [statistics.fmean(values) for values in zip(*curves)],
+        })
+    return results, steps
+
+
+def write_tables(results, out, bin_seconds):
+    """Writes the summary and escape-rate curve tables as CSV."""
+    with open(f"{out}_summary.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["gap_angle_degrees", "rotation_speed_degrees_per_sec", "ball_speed",
+                         "initial_balls", "reached", "runs", "median_s", "mean_s", "min_s", "max_s"])
+        for r in results:
+            writer.writerow([r[p] for p in PARAMETERS] +
+                            [r["reached"], r["runs"], r["median"], r["mean"], r["min"], r["max"]])
+    with open(f"{out}_curves.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["gap_angle_degrees", "rotation_speed_degrees_per_sec", "ball_speed",
+                         "initial_balls", "bin_start_s", "escapes_per_s"])
+        for r in results:
+            for index, rate in enumerate(r["curve"]):
+                writer.writerow([r[p] for p in PARAMETERS] + [index * bin_seconds, round(rate, 4)])
+
+
+def format_seconds(value):
+    """Formats a time column, with '-' for runs that never reached MAX_BALLS."""
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_table(results, target, top):
+    """Prints the configurations whose median time to MAX_BALLS is closest to target."""
+    ranked = sorted(results, key=lambda r: abs(r["median"] - target) if r["median"] is not None else math.inf)
+    print(f"{'gap':>7} {'rotation':>9} {'speed':>6} {'initial':>7} {'reached':>8} "
+          f"{'median s':>9} {'min s':>8} {'max s':>8}")
+    for r in ranked[:top]:
+        print(f"{r['gap']:7.2f} {r['rotation']:9.2f} {r['speed']:6.2f} {r['initial']:7d} "
+              f"{r['reached']:4d}/{r['runs']:<3d} {format_seconds(r['median'])} "
+              f"{format_seconds(r['min'])} {format_seconds(r['max'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Headless parameter sweep (time to MAX_BALLS)')
+    parser.add_argument('--gap', type=float, nargs='+', default=[config.GAP_ANGLE_DEGREES],
+                        help='GAP_ANGLE_DEGREES values (default: config value)')
+    parser.add_argument('--rotation', type=float, nargs='+', default=[config.ROTATION_SPEED_DEGREES_PER_SEC],
+                        help='ROTATION_SPEED_DEGREES_PER_SEC values (default: config value)')
+    parser.add_argument('--speed', type=float, nargs='+', default=[config.BALL_SPEED],
+                        help='BALL_SPEED values (default: config value)')
+    parser.add_argument('--initial', type=int, nargs='+', default=[config.INITIAL_BALLS],
+                        help='INITIAL_BALLS values (default: config value)')
+    parser.add_argument('--random', type=int, default=0, metavar='N',
+                        help='Sample N random configurations between each parameter\'s min and max '
+                             'instead of running the full grid')
+    parser.add_argument('--seeds', type=int, default=4, help='Seeded runs per configuration (default: 4)')
+    parser.add_argument('--max-balls', type=int, default=config.MAX_BALLS,
+                        help='Ball count to reach (default: MAX_BALLS)')
+    parser.add_argument('--until', type=float, default=600,
+                        help='Simulated-time limit per run, in seconds (default: 600)')
+    parser.add_argument('--bin', type=float, default=5, help='Escape-rate bin width, in seconds (default: 5)')
+    parser.add_argument('--target', type=float, default=60,
+                        help='Desired time to MAX_BALLS, in seconds, for ranking (default: 60)')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--out', default='sweep', help='Output file prefix (default: sweep)')
+    args = parser.parse_args()
+
+    values = {"gap": args.gap, "rotation": args.rotation, "speed": args.speed, "initial": args.initial}
+    configs = random_configs(values, args.random, seed=0) if args.random else grid_configs(values)
+    print(f"Configurations: {len(configs)}, seeds: {args.seeds}, runs: {len(configs) * args.seeds}")
+
+    start = time.perf_counter()
+    results, steps = sweep(configs, args.seeds, args.max_balls, args.until, args.bin, args.workers)
+    print(f"Done in {time.perf_counter() - start:.1f}s ({steps} steps)")
+    write_tables(results, args.out, args.bin)
+    print_table(results, args.target, args.top)
+    print(f"Tables written to {args.out}_summary.csv and {args.out}_curves.csv")
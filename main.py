@@ -4,6 +4,11 @@ import random
 import math
 import os
 import time
+import queue
+import threading
+import hashlib
+from abc import ABC, abstractmethod
+import numpy as np
 from pygame import mixer
 
 # 動画出力機能（オプション）
@@ -12,7 +17,6 @@ AUDIO_EXPORT_ENABLED = False
 
 try:
     import cv2
-    import numpy as np
     from datetime import datetime
     VIDEO_EXPORT_ENABLED = True
     print("動画エクスポート機能が有効です")
@@ -64,73 +68,535 @@ GOAL_SOUND_FILE = os.path.join(SOUND_DIR, "goal.wav")
 from config import BLOCK_COLORS, COLOR_NAMES
 
 # デフォルト設定
-DEFAULT_BLOCK_COUNT = 4  # ブロック数は4個固定
+DEFAULT_BLOCK_COUNT = 4  # デフォルトのブロック数
 DEFAULT_VIDEO_COUNT = 1  # デフォルトの動画生成数
 
+# 録画のエンコード設定（FFmpegがある場合。スレッド数0は自動）
+VIDEO_CODEC = "libx264"
+VIDEO_BITRATE = "8000k"
+ENCODER_THREADS = 0
+
+# 1ステップ内で壁との衝突を解決する最大回数（swept AABB判定）
+MAX_SWEEP_ITERATIONS = 4
+
+# BGMのPCM形式（デコード・ミックス用）
+BGM_SAMPLE_RATE = 44100
+BGM_CHANNELS = 2
+
+# 録画キューの最大フレーム数（エンコーダが遅れた場合はゲームループ側が待つ）
+RECORDER_QUEUE_SIZE = 32
+
+# FFmpegのメタデータ等を固定し、同じ入力から同じバイト列の動画を出力する
+BITEXACT_FLAGS = ["-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact"]
+
 # グローバル変数
 pygame_initialized = False
+headless_mode = False
 screen = None
 clock = None
 collision_sound = None
 goal_sound = None
+_bgm_pcm_cache = {}  # BGMファイルのパス -> デコード済みPCM
+
+class SimulationClock:
+    """
+    シミュレーション時間を管理するクロック
+    
+    時間は固定ステップ（1/fps秒）ずつ進むため、実時間に関係なく
+    同じフレーム数なら同じ時刻になる。realtime=Falseの場合は
+    フレームレート制限を行わず、CPUの許す限り高速に進める。
+    """
+    def __init__(self, fps=FPS, realtime=True):
+        self.fps = fps
+        self.step = 1.0 / fps
+        self.realtime = realtime
+        self.frame = 0
+        self._clock = pygame.time.Clock() if realtime else None
+    
+    @property
+    def time(self):
+        """経過したシミュレーション時間（秒）"""
+        # 誤差の蓄積を避けるためフレーム数から計算
+        return self.frame * self.step
+    
+    def tick(self):
+        """1ステップ進める（リアルタイムモードではFPSに合わせて待機）"""
+        self.frame += 1
+        if self._clock is not None:
+            self._clock.tick(self.fps)
+
+def swept_aabb(left, top, right, bottom, move_x, move_y,
+               wall_left, wall_top, wall_right, wall_bottom):
+    """
+    移動する矩形と静止した矩形のswept AABB判定（NumPyのブロードキャストに対応）
+    
+    矩形がmove_x, move_yだけ移動する間に壁の矩形と接触する時刻を、
+    移動量に対する割合（0〜1）で求める。
+    
+    Returns:
+        tuple: (接触時刻（当たらない場合はinf）, 当たった軸（0: x方向, 1: y方向）)
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overlap_x = (left < wall_right) & (wall_left < right)
+        overlap_y = (top < wall_bottom) & (wall_top < bottom)
+        # 各軸について、重なり始める時刻と重なり終わる時刻
+        entry_x = np.where(move_x > 0, (wall_left - right) / move_x,
+                  np.where(move_x < 0, (wall_right - left) / move_x,
+                  np.where(overlap_x, -np.inf, np.inf)))
+        exit_x = np.where(move_x > 0, (wall_right - left) / move_x,
+                 np.where(move_x < 0, (wall_left - right) / move_x,
+                 np.where(overlap_x, np.inf, -np.inf)))
+        entry_y = np.where(move_y > 0, (wall_top - bottom) / move_y,
+                  np.where(move_y < 0, (wall_bottom - top) / move_y,
+                  np.where(overlap_y, -np.inf, np.inf)))
+        exit_y = np.where(move_y > 0, (wall_bottom - top) / move_y,
+                 np.where(move_y < 0, (wall_top - bottom) / move_y,
+                 np.where(overlap_y, np.inf, -np.inf)))
+    
+    entry = np.maximum(entry_x, entry_y)
+    exit_ = np.minimum(exit_x, exit_y)
+    hit = (entry < exit_) & (entry >= 0) & (entry <= 1)
+    toi = np.where(hit, entry, np.inf)
+    axis = np.where(entry_x > entry_y, 0, 1)
+    return toi, axis
+
+
+class BlockSwarm:
+    """
+    ブロックの物理演算をまとめて行うバックエンド
+    
+    位置・速度・サイズをNumPy配列（構造体配列ではなく配列の構造体）で保持し、
+    壁の反射、移動壁との衝突、ブロック同士の重なり解消、ゴール判定を
+    配列演算で一括処理する。Blockクラスはこの配列上の1要素を指すビュー。
+    
+    laneが異なるブロック同士は衝突しないため、1つのBlockSwarmで
+    複数のレースを同時に進めることができる（モンテカルロ集計用）。
+    """
+    def __init__(self):
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.dx = np.zeros(0)
+        self.dy = np.zeros(0)
+        self.size = np.zeros(0, dtype=np.int64)
+        self.reached_goal = np.zeros(0, dtype=bool)
+        self.lane = np.zeros(0, dtype=np.int64)
+        self.pair_tests = 0  # 直前のフレームで判定したブロック同士のペア数
+    
+    def __len__(self):
+        return len(self.x)
+    
+    def add(self, x, y, dx, dy, size, lane=0):
+        """ブロックを追加し、配列上のインデックスを返す"""
+        self.x = np.append(self.x, float(x))
+        self.y = np.append(self.y, float(y))
+        self.dx = np.append(self.dx, float(dx))
+        self.dy = np.append(self.dy, float(dy))
+        self.size = np.append(self.size, int(size))
+        self.reached_goal = np.append(self.reached_goal, False)
+        self.lane = np.append(self.lane, int(lane))
+        return len(self.x) - 1
+    
+    def select(self, mask):
+        """maskがTrueのブロックだけを残す（並び順は維持される）"""
+        for name in ("x", "y", "dx", "dy", "size", "reached_goal", "lane"):
+            setattr(self, name, getattr(self, name)[mask])
+    
+    def bounds(self):
+        """各ブロックの矩形 (left, top, right, bottom) を配列で返す"""
+        half = self.size // 2
+        left = self.x - half
+        top = self.y - half
+        return left, top, left + self.size, top + self.size
+    
+    def overlaps_rect(self, rect):
+        """pygame.Rect.colliderectと同じ条件で、矩形と重なっているブロックのマスクを返す"""
+        left, top, right, bottom = self.bounds()
+        return (left < rect.right) & (rect.left < right) & \
+               (top < rect.bottom) & (rect.top < bottom)
+    
+    def reflect_on_rect(self, rect, dx_sign=0, dy_sign=0):
+        """
+        矩形（移動壁など）と重なっているブロックの速度を指定方向へ反射させる
+        
+        Args:
+            rect (pygame.Rect): 壁の矩形
+            dx_sign (int): 1なら右向き、-1なら左向きに反射（0なら変更なし）
+            dy_sign (int): 1なら下向き、-1なら上向きに反射（0なら変更なし）
+        
+        Returns:
+            int: 衝突したブロック数
+        """
+        hit = self.overlaps_rect(rect)
+        if dx_sign:
+            self.dx[hit] = dx_sign * np.abs(self.dx[hit])
+        if dy_sign:
+            self.dy[hit] = dy_sign * np.abs(self.dy[hit])
+        return int(np.count_nonzero(hit))
+    
+    def overlapping_pairs(self):
+        """
+        重なっているブロックのペア (i, j) を返す
+        
+        BLOCK_SIZE四方のセルによる一様グリッドをフレームごとに作り直し、
+        同じセルと隣接セルにあるブロック同士だけを判定する。セルのキーで
+        ソートし、隣接セルの範囲をsearchsortedで求めてベクトル化している。
+        判定したペア数はpair_testsに記録する。
+        """
+        n = len(self.x)
+        empty = np.zeros(0, dtype=np.int64)
+        self.pair_tests = 0
+        if n < 2:
+            return empty, empty
+        
+        # セルの大きさは最大のブロック以上にする（重なる相手は必ず隣接セルに入る）
+        cell_size = max(BLOCK_SIZE, int(self.size.max()))
+        cell_x = np.floor(self.x / cell_size).astype(np.int64)
+        cell_y = np.floor(self.y / cell_size).astype(np.int64)
+        cell_x -= cell_x.min()
+        cell_y -= cell_y.min() - 1  # 上隣のセル(cell_y - 1)も0以上にする
+        row = int(cell_y.max()) + 2
+        # レーンごとにキーの範囲を分け、別レーンのブロックが隣接セルにならないようにする
+        lane_width = int(cell_x.max()) + 2
+        keys = (self.lane * lane_width + cell_x) * row + cell_y
+        
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        positions = np.arange(n)
+        
+        # 同じセル内（自分より後ろ）と、重複しないよう半分の隣接セルだけを見る
+        ranges = [(positions + 1, np.searchsorted(sorted_keys, sorted_keys, side="right"))]
+        for offset in (row - 1, row, row + 1, 1):
+            target = sorted_keys + offset
+            ranges.append((np.searchsorted(sorted_keys, target, side="left"),
+                           np.searchsorted(sorted_keys, target, side="right")))
+        
+        first, second = [], []
+        for start, stop in ranges:
+            counts = np.maximum(stop - start, 0)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # 各ブロックの候補範囲 [start, stop) を展開して候補ペアを作る
+            owner = np.repeat(positions, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            first.append(order[owner])
+            second.append(order[np.repeat(start, counts) + offsets])
+        
+        if not first:
+            return empty, empty
+        i = np.concatenate(first)
+        j = np.concatenate(second)
+        self.pair_tests = len(i)
+        
+        # 候補ペアの矩形判定（pygame.Rect.colliderectと同じ条件）
+        left, top, right, bottom = self.bounds()
+        hit = (left[i] < right[j]) & (left[j] < right[i]) & \
+              (top[i] < bottom[j]) & (top[j] < bottom[i])
+        return i[hit], j[hit]
+    
+    def _overlaps(self, indices, rect):
+        """指定したブロックが矩形と重なっているかどうかのマスクを返す"""
+        half = self.size[indices] // 2
+        left = self.x[indices] - half
+        top = self.y[indices] - half
+        size = self.size[indices]
+        return (left < rect.right) & (rect.left < left + size) & \
+               (top < rect.bottom) & (rect.top < top + size)
+    
+    def sweep(self, indices, box_rect, moving_wall_y=None, obstacles=None, dt=1.0,
+              goal_rect=None):
+        """
+        指定したブロックをdtフレーム分、壁に当たる時刻を求めながら進める
+        
+        箱の4辺と障害物の壁をすべて矩形として扱い、壁との相対速度による
+        swept AABB判定で最も早く当たる壁を求める。その時刻まで進めて反射させ、
+        残りの時間で同じ判定を繰り返す（最大MAX_SWEEP_ITERATIONS回）。
+        上限に達しても残った時間は壁を考慮せずにそのまま進める
+        （箱からはみ出した分はclamp_to_boxで戻す）。
+        フレーム間の位置だけで判定しないため、ステップが大きくても
+        薄い壁をすり抜けない。
+        
+        Args:
+            indices (array): 進めるブロックのインデックス
+            box_rect (pygame.Rect): 箱の矩形
+            moving_wall_y (float): 上部移動壁のY座標（Noneなら箱の上端）
+            obstacles (ObstacleField): 障害物（省略時は箱の壁のみ）
+            dt (float): 進めるフレーム数
+            goal_rect (pygame.Rect): 移動中にゴールに触れたかを調べる矩形
+        
+        Returns:
+            tuple: (壁に衝突したかどうかのマスク, 移動中にゴールに触れたかどうかのマスク)
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        count = len(indices)
+        wall_hit = np.zeros(count, dtype=bool)
+        touched_goal = np.zeros(count, dtype=bool)
+        if count == 0:
+            return wall_hit, touched_goal
+        
+        # 箱の4辺を、箱の外側に十分な厚みを持つ矩形の壁として表す
+        big = float(max(box_rect.width, box_rect.height))
+        ceiling = box_rect.top if moving_wall_y is None else moving_wall_y
+        ceiling_vy = 0.0
+        if obstacles is not None and moving_wall_y is not None:
+            ceiling_vy = obstacles.ceiling_velocity()
+        w_left = [box_rect.left - big, box_rect.right, box_rect.left - big, box_rect.left - big]
+        w_top = [box_rect.top - big, box_rect.top - big, box_rect.bottom, ceiling - big]
+        w_right = [box_rect.left, box_rect.right + big, box_rect.right + big, box_rect.right + big]
+        w_bottom = [box_rect.bottom + big, box_rect.bottom + big, box_rect.bottom + big, ceiling]
+        w_vx = [0.0, 0.0, 0.0, 0.0]
+        w_vy = [0.0, 0.0, 0.0, ceiling_vy]
+        walls = [np.array(values, dtype=float)
+                 for values in (w_left, w_top, w_right, w_bottom, w_vx, w_vy)]
+        if obstacles is not None:
+            walls = [np.concatenate([box_values, obstacle_values])
+                     for box_values, obstacle_values in zip(walls, obstacles.swept_walls())]
+        w_left, w_top, w_right, w_bottom, w_vx, w_vy = [values[:, None] for values in walls]
+        
+        half = self.size[indices] // 2
+        remaining = np.full(count, float(dt))
+        for _ in range(MAX_SWEEP_ITERATIONS):
+            moving = np.flatnonzero(remaining > 0)
+            if len(moving) == 0:
+                break
+            sel = indices[moving]
+            rem = remaining[moving]
+            elapsed = dt - rem  # このブロックがステップ内ですでに進んだ時間
+            
+            left = self.x[sel] - half[moving]
+            top = self.y[sel] - half[moving]
+            right = left + self.size[sel]
+            bottom = top + self.size[sel]
+            
+            # 壁の位置をブロックの経過時間に合わせ、壁から見た相対移動量で判定する
+            shift_x = w_vx * elapsed
+            shift_y = w_vy * elapsed
+            move_x = (self.dx[sel] - w_vx) * rem
+            move_y = (self.dy[sel] - w_vy) * rem
+            toi, axis = swept_aabb(left, top, right, bottom, move_x, move_y,
+                                   w_left + shift_x, w_top + shift_y,
+                                   w_right + shift_x, w_bottom + shift_y)
+            
+            # 最も早く当たる壁を選ぶ
+            nearest = np.argmin(toi, axis=0)
+            columns = np.arange(len(moving))
+            t = toi[nearest, columns]
+            hit = np.isfinite(t)
+            t = np.where(hit, t, 1.0)
+            
+            self.x[sel] += self.dx[sel] * rem * t
+            self.y[sel] += self.dy[sel] * rem * t
+            
+            # 当たった面の法線方向に、壁から離れる向きへ反射させる
+            flip_x = hit & (axis[nearest, columns] == 0)
+            flip_y = hit & (axis[nearest, columns] == 1)
+            rel_x = move_x[nearest, columns]
+            rel_y = move_y[nearest, columns]
+            self.dx[sel[flip_x]] = -np.sign(rel_x[flip_x]) * np.abs(self.dx[sel[flip_x]])
+            self.dy[sel[flip_y]] = -np.sign(rel_y[flip_y]) * np.abs(self.dy[sel[flip_y]])
+            
+            wall_hit[moving] |= hit
+            if goal_rect is not None:
+                touched_goal[moving] |= self._overlaps(sel, goal_rect)
+            remaining[moving] = np.where(hit, rem * (1.0 - t), 0.0)
+        
+        # 反復の上限に達しても残った時間（角で反射を繰り返した場合など）の移動
+        leftover = np.flatnonzero(remaining > 0)
+        if len(leftover):
+            sel = indices[leftover]
+            self.x[sel] += self.dx[sel] * remaining[leftover]
+            self.y[sel] += self.dy[sel] * remaining[leftover]
+            if goal_rect is not None:
+                touched_goal[leftover] |= self._overlaps(sel, goal_rect)
+        
+        return wall_hit, touched_goal
+    
+    def clamp_to_box(self, box_rect, moving_wall_y=None, indices=None):
+        """
+        箱の外側にはみ出したブロックを内側へ戻し、壁から離れる向きに反射させる
+        
+        移動壁に追い越された場合や、ブロック同士の衝突で押し戻された場合の補正。
+        上部移動壁と下の壁の間がブロックより狭い場合は下の壁を優先する。
+        
+        Args:
+            box_rect (pygame.Rect): 箱の矩形
+            moving_wall_y (float): 上部移動壁のY座標（Noneなら箱の上端）
+            indices (array): 補正するブロックのインデックス（省略時は全ブロック）
+        
+        Returns:
+            array: indicesの各ブロックが壁の外側にいたかどうかのマスク
+        """
+        if indices is None:
+            indices = np.arange(len(self.x))
+        indices = np.asarray(indices, dtype=np.int64)
+        half = self.size[indices] // 2
+        x, y = self.x[indices], self.y[indices]
+        dx, dy = self.dx[indices], self.dy[indices]
+        
+        # 左右の壁
+        hit_left = x - half < box_rect.left
+        hit_right = ~hit_left & (x + half > box_rect.right)
+        x = np.where(hit_left, box_rect.left + half, x)
+        x = np.where(hit_right, box_rect.right - half, x)
+        dx = np.where(hit_left, np.abs(dx), dx)
+        dx = np.where(hit_right, -np.abs(dx), dx)
+        
+        # 上の壁（移動壁対応）と下の壁
+        top = box_rect.top if moving_wall_y is None else moving_wall_y
+        hit_top = y - half < top
+        y = np.where(hit_top, top + half, y)
+        dy = np.where(hit_top, np.abs(dy), dy)
+        hit_bottom = y + half > box_rect.bottom
+        y = np.where(hit_bottom, box_rect.bottom - half, y)
+        dy = np.where(hit_bottom, -np.abs(dy), dy)
+        
+        self.x[indices], self.y[indices] = x, y
+        self.dx[indices], self.dy[indices] = dx, dy
+        return hit_left | hit_right | hit_top | hit_bottom
+    
+    def step(self, box_rect, goal_rect, moving_wall_y=None, obstacles=None, dt=1.0):
+        """
+        全ブロックをdtフレーム分進める
+        
+        Args:
+            box_rect (pygame.Rect): 箱の矩形
+            goal_rect (pygame.Rect): ゴールの矩形
+            moving_wall_y (float): 上部移動壁のY座標（Noneなら箱の上端）
+            obstacles (ObstacleField): 移動中に衝突判定する障害物
+            dt (float): 進めるフレーム数
+        
+        Returns:
+            tuple: (新たにゴールしたブロックのうち最小のインデックス（なければNone）,
+                    衝突が発生したかどうか)
+        """
+        old_x, old_y = self.x.copy(), self.y.copy()
+        
+        # 位置の更新（壁との衝突時刻を求めながら進める）
+        wall_hit, touched_goal = self.sweep(np.arange(len(self.x)), box_rect, moving_wall_y,
+                                            obstacles, dt, goal_rect)
+        
+        # 移動前から壁の外側にいたブロック（移動壁に追い越された場合など）の補正
+        clamped = self.clamp_to_box(box_rect, moving_wall_y)
+        
+        collided = bool((wall_hit | clamped).any())
+        
+        # ブロック同士の衝突（各ブロックは最初に見つかった相手1つに対して反射）
+        i, j = self.overlapping_pairs()
+        if len(i):
+            collided = True
+            a = np.concatenate([i, j])
+            b = np.concatenate([j, i])
+            order = np.lexsort((b, a))
+            a, b = a[order], b[order]
+            a, first = np.unique(a, return_index=True)
+            b = b[first]
+            
+            # 衝突したブロックは前の位置に戻す
+            self.x[a] = old_x[a]
+            self.y[a] = old_y[a]
+            
+            # 衝突方向を判定して適切に反射
+            offset_x = self.x[a] - self.x[b]
+            offset_y = self.y[a] - self.y[b]
+            horizontal = np.abs(offset_x) > np.abs(offset_y)
+            self.dx[a] = np.where(horizontal, np.copysign(np.abs(self.dx[a]), offset_x), self.dx[a])
+            self.dy[a] = np.where(horizontal, self.dy[a], np.copysign(np.abs(self.dy[a]), offset_y))
+            
+            # 少し移動して重ならないようにする
+            self.x[a] += self.dx[a] * 0.5
+            self.y[a] += self.dy[a] * 0.5
+            
+            # 前の位置は移動壁に追い越されている場合があるので、箱の内側へ戻す
+            self.clamp_to_box(box_rect, moving_wall_y, a)
+        
+        # ゴール判定（移動の途中でゴールに触れた場合も含む）
+        reached = (self.overlaps_rect(goal_rect) | touched_goal) & ~self.reached_goal
+        self.reached_goal |= reached
+        winner = int(np.argmax(reached)) if reached.any() else None
+        return winner, collided
+
 
 class Block:
-    def __init__(self, x, y, color, index):
-        self.x = x
-        self.y = y
+    """
+    1つのブロックを表すクラス
+    
+    状態はBlockSwarmの配列に保持され、このクラスはその1要素へのビューとなる。
+    swarmを省略した場合は自分専用のBlockSwarmを作成する。
+    """
+    def __init__(self, x, y, color, index, swarm=None):
+        self.swarm = swarm if swarm is not None else BlockSwarm()
         self.size = BLOCK_SIZE
         self.color = color
         self.index = index
         self.speed = 6  # 基本速度
         # 斜め4方向のみに移動（ランダムな初期方向）
         angle = random.choice([45, 135, 225, 315])
-        self.dx = self.speed * math.cos(math.radians(angle))
-        self.dy = self.speed * math.sin(math.radians(angle))
-        self.reached_goal = False
-        self.rect = pygame.Rect(self.x - self.size//2, self.y - self.size//2, self.size, self.size)
+        dx = self.speed * math.cos(math.radians(angle))
+        dy = self.speed * math.sin(math.radians(angle))
+        self.slot = self.swarm.add(x, y, dx, dy, self.size)
+    
+    @property
+    def x(self):
+        return float(self.swarm.x[self.slot])
     
-    def update(self, box_rect, goal_rect, blocks=None, moving_wall_y=None):
+    @x.setter
+    def x(self, value):
+        self.swarm.x[self.slot] = value
+    
+    @property
+    def y(self):
+        return float(self.swarm.y[self.slot])
+    
+    @y.setter
+    def y(self, value):
+        self.swarm.y[self.slot] = value
+    
+    @property
+    def dx(self):
+        return float(self.swarm.dx[self.slot])
+    
+    @dx.setter
+    def dx(self, value):
+        self.swarm.dx[self.slot] = value
+    
+    @property
+    def dy(self):
+        return float(self.swarm.dy[self.slot])
+    
+    @dy.setter
+    def dy(self, value):
+        self.swarm.dy[self.slot] = value
+    
+    @property
+    def reached_goal(self):
+        return bool(self.swarm.reached_goal[self.slot])
+    
+    @reached_goal.setter
+    def reached_goal(self, value):
+        self.swarm.reached_goal[self.slot] = value
+    
+    @property
+    def rect(self):
+        return pygame.Rect(self.x - self.size//2, self.y - self.size//2, self.size, self.size)
+    
+    def update(self, box_rect, goal_rect, blocks=None, moving_wall_y=None,
+               obstacles=None, dt=1.0):
+        """
+        このブロックだけをdtフレーム分進める（1個ずつ更新する場合の互換API）
+        
+        blocksの全ブロックと総当たりで衝突判定する。全ブロックをまとめて
+        更新する場合は、近傍のブロックだけを判定するBlockSwarm.stepを使用する。
+        """
         # 前の位置を保存
         old_x, old_y = self.x, self.y
         
-        # 位置の更新
-        self.x += self.dx
-        self.y += self.dy
-        
-        # 矩形の更新
-        self.rect = pygame.Rect(self.x - self.size//2, self.y - self.size//2, self.size, self.size)
-        
-        # 壁との衝突判定と反射
-        collision_occurred = False
-        
-        # 左の壁
-        if self.x - self.size//2 < box_rect.left:
-            self.x = box_rect.left + self.size//2
-            self.dx = abs(self.dx)  # 右向きに反射
-            collision_occurred = True
-        
-        # 右の壁
-        elif self.x + self.size//2 > box_rect.right:
-            self.x = box_rect.right - self.size//2
-            self.dx = -abs(self.dx)  # 左向きに反射
-            collision_occurred = True
-        
-        # 上の壁（移動壁対応）
-        if moving_wall_y is not None:
-            if self.y - self.size//2 < moving_wall_y:
-                self.y = moving_wall_y + self.size//2
-                self.dy = abs(self.dy)  # 下向きに反射
-                collision_occurred = True
-        elif self.y - self.size//2 < box_rect.top:
-            self.y = box_rect.top + self.size//2
-            self.dy = abs(self.dy)  # 下向きに反射
-            collision_occurred = True
-        
-        # 下の壁
-        if self.y + self.size//2 > box_rect.bottom:
-            self.y = box_rect.bottom - self.size//2
-            self.dy = -abs(self.dy)  # 上向きに反射
-            collision_occurred = True
+        # 位置の更新（壁との衝突時刻を求めながら進める）
+        wall_hit, touched_goal = self.swarm.sweep([self.slot], box_rect, moving_wall_y,
+                                                  obstacles, dt, goal_rect)
+        
+        # 壁との衝突判定と反射（移動前から壁の外側にいた場合の補正）
+        clamped = self.swarm.clamp_to_box(box_rect, moving_wall_y, [self.slot])
+        collision_occurred = bool(wall_hit[0] or clamped[0])
         
         # 壁との衝突時に音を鳴らす
         global collision_sound
@@ -139,11 +605,13 @@ class Block:
         
         # ブロック同士の衝突判定
         if blocks:
+            rect = self.rect
             for other in blocks:
-                if other is not self and self.rect.colliderect(other.rect):
+                if other is self:
+                    continue
+                if rect.colliderect(other.rect):
                     # 衝突が検出された場合、前の位置に戻す
                     self.x, self.y = old_x, old_y
-                    self.rect = pygame.Rect(self.x - self.size//2, self.y - self.size//2, self.size, self.size)
                     
                     # 衝突方向を判定して適切に反射
                     dx = self.x - other.x
@@ -160,7 +628,7 @@ class Block:
                     # 衝突後の新しい位置に更新（少し移動して重ならないようにする）
                     self.x += self.dx * 0.5
                     self.y += self.dy * 0.5
-                    self.rect = pygame.Rect(self.x - self.size//2, self.y - self.size//2, self.size, self.size)
+                    self.swarm.clamp_to_box(box_rect, moving_wall_y, [self.slot])
                     
                     if collision_sound:
                         collision_sound.play()
@@ -168,7 +636,7 @@ class Block:
         
         # ゴールとの衝突判定
         global goal_sound
-        if self.rect.colliderect(goal_rect) and not self.reached_goal:
+        if (touched_goal[0] or self.rect.colliderect(goal_rect)) and not self.reached_goal:
             self.reached_goal = True
             if goal_sound:
                 goal_sound.play()
@@ -177,22 +645,644 @@ class Block:
         return False
     
     def draw(self, surface):
-        pygame.draw.rect(surface, self.color, 
-                         (self.x - self.size//2, self.y - self.size//2, self.size, self.size))
+        """ブロックを描画し、描画した領域の矩形を返す"""
+        x, y = self.x, self.y
+        rect = pygame.draw.rect(surface, self.color, 
+                                (x - self.size//2, y - self.size//2, self.size, self.size))
         # シンプルな軌跡描画（1ピクセル）
-        pygame.draw.circle(surface, self.color, (int(self.x), int(self.y)), 3)
+        return rect.union(pygame.draw.circle(surface, self.color, (int(x), int(y)), 3))
+
+class WallGroup(ABC):
+    """
+    同じ種類の移動壁をまとめて管理する基底クラス
+    
+    create_obstacles()の設定（辞書）から壁を生成し、状態をNumPy配列で
+    フレームをまたいで保持する。step()で固定ステップ（dtフレーム）ずつ進め、
+    collide()で全ブロックとの衝突を壁の種類ごとに一括で判定する。
+    velocities()は1フレームあたりの移動量で、swept AABB判定に使用する。
+    サブクラスはstep()、rects()、segments()を実装する。
+    """
+    obstacle_type = None
+    # 衝突したブロックの反射方向 (dx_sign, dy_sign)
+    bounce = (0, 0)
+    
+    def __init__(self, specs):
+        self.specs = specs
+        self.colors = [spec['color'] for spec in specs]
+        self.thickness = np.array([spec.get('thickness', 5) for spec in specs])
+    
+    def __len__(self):
+        return len(self.specs)
+    
+    @abstractmethod
+    def step(self, sim_time, dt=1.0):
+        """壁の状態をdtフレーム分進める"""
+    
+    @abstractmethod
+    def rects(self):
+        """各壁の当たり判定矩形 (left, top, width, height) と有効フラグを配列で返す"""
+    
+    def velocities(self):
+        """各壁の1フレームあたりの移動量 (vx, vy) を配列で返す"""
+        zeros = np.zeros(len(self))
+        return zeros, zeros
+    
+    def swept_walls(self):
+        """有効な壁の矩形 (left, top, right, bottom) と移動量 (vx, vy) を返す"""
+        left, top, width, height, active = self.rects()
+        vx, vy = self.velocities()
+        w_left = np.floor(left[active])
+        w_top = np.floor(top[active])
+        return (w_left, w_top, w_left + width[active], w_top + height[active],
+                vx[active], vy[active])
+    
+    @abstractmethod
+    def segments(self):
+        """描画用の線分 (color, start, end, thickness) を返す"""
+    
+    def collide(self, swarm):
+        """
+        全ブロックとの衝突を判定し、衝突したブロックをbounce方向へ反射させる
+        
+        Returns:
+            int: 衝突したブロック数
+        """
+        if len(swarm) == 0:
+            return 0
+        left, top, width, height, active = self.rects()
+        if not active.any():
+            return 0
+        
+        # (壁の数, ブロック数)の配列で一括判定（pygame.Rect.colliderectと同じ条件）
+        b_left, b_top, b_right, b_bottom = swarm.bounds()
+        w_left = np.floor(left[active])[:, None]
+        w_top = np.floor(top[active])[:, None]
+        w_right = w_left + width[active][:, None]
+        w_bottom = w_top + height[active][:, None]
+        hit = ((b_left < w_right) & (w_left < b_right) &
+               (b_top < w_bottom) & (w_top < b_bottom)).any(axis=0)
+        
+        dx_sign, dy_sign = self.bounce
+        if dx_sign:
+            swarm.dx[hit] = dx_sign * np.abs(swarm.dx[hit])
+        if dy_sign:
+            swarm.dy[hit] = dy_sign * np.abs(swarm.dy[hit])
+        return int(np.count_nonzero(hit))
+    
+    def draw(self, surface):
+        """壁を描画し、描画した領域の矩形のリストを返す"""
+        return [pygame.draw.line(surface, color, start, end, thickness)
+                for color, start, end, thickness in self.segments()]
+
+
+class HorizontalMovingWalls(WallGroup):
+    """
+    上から下へ移動する水平壁（箱の上端の代わりになる）
+    
+    start_time秒後に動き始め、durationの秒数をかけてmove_rangeの範囲を移動する。
+    durationがない場合はvelocity（1フレームあたりの移動量）で移動する。
+    """
+    obstacle_type = 'horizontal_moving'
+    bounce = (0, 1)  # 下向きに反射
+    
+    def __init__(self, specs):
+        super().__init__(specs)
+        self.x = np.array([spec['position'][0] for spec in specs], dtype=float)
+        self.length = np.array([spec.get('length', BOX_SIZE) for spec in specs], dtype=float)
+        self.y_start = np.array([spec['move_range'][0] for spec in specs], dtype=float)
+        self.y_end = np.array([spec['move_range'][1] for spec in specs], dtype=float)
+        self.start_time = np.array([spec.get('start_time', 0) for spec in specs], dtype=float)
+        self.duration = np.array([
+            spec['duration'] if 'duration' in spec
+            else (spec['move_range'][1] - spec['move_range'][0]) / (abs(spec['velocity'][1]) * FPS)
+            for spec in specs
+        ], dtype=float)
+        self.y = self.y_start.copy()
+        self.active = np.zeros(len(specs), dtype=bool)
+        self.moving = np.zeros(len(specs), dtype=bool)
+    
+    def step(self, sim_time, dt=1.0):
+        elapsed = sim_time - self.start_time
+        self.active = elapsed >= 0
+        progress = np.clip(elapsed / self.duration, 0.0, 1.0)
+        self.y = self.y_start + (self.y_end - self.y_start) * progress
+        self.moving = self.active & (progress < 1.0)
+    
+    def velocities(self):
+        vy = np.where(self.moving, (self.y_end - self.y_start) / (self.duration * FPS), 0.0)
+        return np.zeros(len(self)), vy
+    
+    def ceiling_velocity(self):
+        """最も下にある動作中の壁の移動量（動作中の壁がなければ0）"""
+        if not self.active.any():
+            return 0.0
+        lowest = np.flatnonzero(self.active)[np.argmax(self.y[self.active])]
+        return float(self.velocities()[1][lowest])
+    
+    def ceiling_y(self):
+        """動作中の壁のうち最も下にあるもののY座標（動作中の壁がなければNone）"""
+        if not self.active.any():
+            return None
+        return float(self.y[self.active].max())
+    
+    def rects(self):
+        return (self.x, self.y - self.thickness // 2, self.length,
+                self.thickness, self.active)
+    
+    def segments(self):
+        return [(self.colors[i], (self.x[i], self.y[i]),
+                 (self.x[i] + self.length[i], self.y[i]), int(self.thickness[i]))
+                for i in np.flatnonzero(self.active)]
+
+
+class VerticalOscillatingWalls(WallGroup):
+    """正弦波状に上下に振動する垂直壁（右向きに反射）"""
+    obstacle_type = 'vertical_oscillating'
+    bounce = (1, 0)  # 右向きに反射
+    
+    def __init__(self, specs):
+        super().__init__(specs)
+        self.x = np.array([spec['position'][0] for spec in specs], dtype=float)
+        self.center_y = np.array([spec['position'][1] for spec in specs], dtype=float)
+        self.amplitude = np.array([spec['amplitude'] for spec in specs], dtype=float)
+        self.speed = np.array([spec['speed'] for spec in specs], dtype=float)
+        self.length = np.array([spec.get('length', 100) for spec in specs], dtype=float)
+        self.phase = np.zeros(len(specs))
+        self.y = self.center_y.copy()
+    
+    def step(self, sim_time, dt=1.0):
+        self.phase += self.speed * dt
+        self.y = self.center_y + self.amplitude * np.sin(self.phase)
+    
+    def velocities(self):
+        return np.zeros(len(self)), self.amplitude * self.speed * np.cos(self.phase)
+    
+    def rects(self):
+        return (self.x - self.thickness // 2, self.y - self.length / 2, self.thickness,
+                self.length, np.ones(len(self), dtype=bool))
+    
+    def segments(self):
+        return [(self.colors[i], (self.x[i], self.y[i] - self.length[i] / 2),
+                 (self.x[i], self.y[i] + self.length[i] / 2), int(self.thickness[i]))
+                for i in range(len(self))]
 
-def initialize_pygame():
-    """Pygameの初期化を行う関数"""
-    global pygame_initialized, screen, clock, collision_sound, goal_sound
+
+class HorizontalPatrollingWalls(WallGroup):
+    """move_rangeの範囲を左右に往復する水平壁（上向きに反射）"""
+    obstacle_type = 'horizontal_patrolling'
+    bounce = (0, -1)  # 上向きに反射
+    
+    def __init__(self, specs):
+        super().__init__(specs)
+        self.x = np.array([spec['position'][0] for spec in specs], dtype=float)
+        self.y = np.array([spec['position'][1] for spec in specs], dtype=float)
+        self.dx = np.array([spec['velocity'][0] for spec in specs], dtype=float)
+        self.x_min = np.array([spec['move_range'][0] for spec in specs], dtype=float)
+        self.x_max = np.array([spec['move_range'][1] for spec in specs], dtype=float)
+        self.length = np.array([spec.get('length', 100) for spec in specs], dtype=float)
+    
+    def step(self, sim_time, dt=1.0):
+        self.x += self.dx * dt
+        # 範囲外に出たら向きを反転
+        outside = (self.x < self.x_min) | (self.x > self.x_max)
+        self.dx = np.where(outside, -self.dx, self.dx)
+    
+    def rects(self):
+        return (self.x - self.length // 2, self.y - self.thickness // 2, self.length,
+                self.thickness, np.ones(len(self), dtype=bool))
+    
+    def velocities(self):
+        return self.dx, np.zeros(len(self))
+    
+    def segments(self):
+        return [(self.colors[i], (self.x[i] - self.length[i] // 2, self.y[i]),
+                 (self.x[i] + self.length[i] // 2, self.y[i]), int(self.thickness[i]))
+                for i in range(len(self))]
+
+
+# 障害物タイプと実装クラスの対応
+WALL_GROUP_CLASSES = {
+    cls.obstacle_type: cls
+    for cls in (HorizontalMovingWalls, VerticalOscillatingWalls, HorizontalPatrollingWalls)
+}
+
+
+class ObstacleField:
+    """
+    create_obstacles()の設定から障害物を生成し、まとめて管理するクラス
+    
+    障害物はタイプごとにWallGroupへまとめられ、衝突判定はタイプごとに
+    1回の配列演算で全ブロックに対して行う。
+    """
+    def __init__(self, obstacles):
+        specs_by_type = {}
+        for spec in obstacles:
+            if spec['type'] not in WALL_GROUP_CLASSES:
+                raise ValueError(f"未知の障害物タイプです: {spec['type']}")
+            specs_by_type.setdefault(spec['type'], []).append(spec)
+        self.groups = [WALL_GROUP_CLASSES[obstacle_type](specs)
+                       for obstacle_type, specs in specs_by_type.items()]
+    
+    def step(self, sim_time, dt=1.0):
+        """全障害物をdtフレーム分進める"""
+        for group in self.groups:
+            group.step(sim_time, dt)
+    
+    def ceiling_y(self):
+        """上部移動壁のY座標（動作中の上部移動壁がなければNone）"""
+        ceilings = [group.ceiling_y() for group in self.groups
+                    if isinstance(group, HorizontalMovingWalls)]
+        ceilings = [y for y in ceilings if y is not None]
+        return max(ceilings) if ceilings else None
+    
+    def ceiling_velocity(self):
+        """上部移動壁の1フレームあたりの移動量（下向きが正）"""
+        ceilings = [(group.ceiling_y(), group.ceiling_velocity()) for group in self.groups
+                    if isinstance(group, HorizontalMovingWalls)]
+        ceilings = [ceiling for ceiling in ceilings if ceiling[0] is not None]
+        return max(ceilings)[1] if ceilings else 0.0
+    
+    def swept_walls(self):
+        """全障害物の矩形と移動量をswept AABB判定用の配列にまとめて返す"""
+        parts = [group.swept_walls() for group in self.groups]
+        if not parts:
+            return tuple(np.zeros(0) for _ in range(6))
+        return tuple(np.concatenate(values) for values in zip(*parts))
+    
+    def collide(self, swarm):
+        """全障害物と全ブロックの衝突を判定し、衝突があればTrueを返す"""
+        hits = 0
+        for group in self.groups:
+            hits += group.collide(swarm)
+        return hits > 0
+    
+    def draw(self, surface):
+        """全障害物を描画し、描画した領域の矩形のリストを返す"""
+        rects = []
+        for group in self.groups:
+            rects.extend(group.draw(surface))
+        return rects
+
+
+class FullFrameRenderer:
+    """
+    毎フレーム画面全体を描き直すレンダラー（従来の描画方法）
+    
+    render()で1フレーム分を描画して更新が必要な矩形のリストを返し、
+    present()で画面に転送する。
+    """
+    def __init__(self, surface, box_rect, goal_rect):
+        self.surface = surface
+        self.box_rect = box_rect
+        self.goal_rect = goal_rect
+    
+    def draw_static(self, surface, top_wall=True):
+        """箱の枠とゴールを描画する（top_wall=Falseなら上の壁は描画しない）"""
+        left, top, right, bottom = (self.box_rect.left, self.box_rect.top,
+                                    self.box_rect.right, self.box_rect.bottom)
+        if top_wall:
+            pygame.draw.rect(surface, BOX_COLOR, self.box_rect, 2)
+        else:
+            # 左、右、下の壁のみ描画
+            pygame.draw.line(surface, BOX_COLOR, (left, top), (left, bottom), 2)  # 左
+            pygame.draw.line(surface, BOX_COLOR, (right, top), (right, bottom), 2)  # 右
+            pygame.draw.line(surface, BOX_COLOR, (left, bottom), (right, bottom), 2)  # 下
+        pygame.draw.rect(surface, GOAL_COLOR, self.goal_rect)
+    
+    def render(self, obstacle_field, blocks, moving_wall_y=None, overlays=()):
+        """
+        1フレーム分を描画する
+        
+        Args:
+            obstacle_field (ObstacleField): 障害物
+            blocks (list): 描画するブロック
+            moving_wall_y (float): 上部移動壁のY座標（動作中は箱の上の壁を描画しない）
+            overlays (list): 最前面に描画する (Surface, Rect) のリスト
+        
+        Returns:
+            list: 画面に転送が必要な矩形のリスト
+        """
+        self.surface.fill(BACKGROUND_COLOR)
+        obstacle_field.draw(self.surface)
+        self.draw_static(self.surface, top_wall=moving_wall_y is None)
+        for block in blocks:
+            block.draw(self.surface)
+        for image, rect in overlays:
+            self.surface.blit(image, rect)
+        return [self.surface.get_rect()]
+    
+    def present(self, dirty):
+        pygame.display.flip()
+
+
+class DirtyRectRenderer(FullFrameRenderer):
+    """
+    変化した領域だけを描き直すレンダラー
+    
+    箱の枠とゴールは静的レイヤー（上の壁あり/なしの2枚）としてキャッシュする。
+    毎フレーム、前のフレームで障害物・ブロック・テキストを描いた領域だけを
+    静的レイヤーで消してから描き直し、変化した矩形だけをdisplay.updateで転送する。
+    描画結果はFullFrameRendererと同じで、録画用の画面全体も常に正しい内容に保たれる。
+    """
+    def __init__(self, surface, box_rect, goal_rect):
+        super().__init__(surface, box_rect, goal_rect)
+        self.layers = {}
+        self.foregrounds = {}
+        for top_wall in (True, False):
+            layer = surface.copy()
+            layer.fill(BACKGROUND_COLOR)
+            self.draw_static(layer, top_wall)
+            self.layers[top_wall] = layer
+            # 障害物の上に重ねる箱の枠とゴール（それ以外は透明）
+            foreground = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+            self.draw_static(foreground, top_wall)
+            self.foregrounds[top_wall] = foreground
+        self.background = None
+        self.previous = []
+    
+    def render(self, obstacle_field, blocks, moving_wall_y=None, overlays=()):
+        top_wall = moving_wall_y is None
+        background = self.layers[top_wall]
+        if background is not self.background:
+            # 静的レイヤーが切り替わったフレームだけ画面全体を描き直す
+            self.surface.blit(background, (0, 0))
+            self.background = background
+            full_frame = True
+        else:
+            for rect in self.previous:
+                self.surface.blit(background, rect, rect)
+            full_frame = False
+        
+        drawn = obstacle_field.draw(self.surface)
+        # 障害物と重なった部分の箱の枠とゴールを描き直す（FullFrameRendererと同じ重なり順）
+        foreground = self.foregrounds[top_wall]
+        for rect in drawn:
+            self.surface.blit(foreground, rect, rect)
+        for block in blocks:
+            drawn.append(block.draw(self.surface))
+        for image, rect in overlays:
+            drawn.append(self.surface.blit(image, rect))
+        
+        # 前のフレームの領域（消した部分）と今回描いた領域の両方を転送する
+        dirty = [self.surface.get_rect()] if full_frame else self.previous + drawn
+        self.previous = drawn
+        return dirty
+    
+    def present(self, dirty):
+        pygame.display.update(dirty)
+
+
+def surface_bgra_view(surface):
+    """
+    サーフェスのピクセルバッファをコピーせずに (height, width, 4) のBGRA配列として参照する
+    
+    32ビットのBGRA/BGRX形式（リトルエンディアンでRマスクが0xFF0000）のサーフェスのみ対応し、
+    それ以外の形式ではNoneを返す。配列が残っている間はサーフェスがロックされるため、
+    次の描画の前に参照を破棄すること。
+    
+    StreamingRecorder.capture()はこの配列を1回だけコピーしてキューに入れる。エンコーダ
+    スレッドがフレームを書き込むのは画面が次のフレームで上書きされた後なので、この
+    コピーは省けない（array3dや転置、色変換による中間コピーはない）。
+    
+    Args:
+        surface (pygame.Surface): 参照するサーフェス
+    
+    Returns:
+        numpy.ndarray: BGRA配列（未対応の形式ならNone）
+    """
+    if (surface.get_bitsize() != 32 or sys.byteorder != "little" or
+            surface.get_masks()[:3] != (0xFF0000, 0xFF00, 0xFF)):
+        return None
+    width, height = surface.get_size()
+    pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint8)
+    return pixels.reshape(height, surface.get_pitch() // 4, 4)[:, :width]
+
+
+def ffmpeg_rawvideo_command(filename, fps, size, codec=VIDEO_CODEC, bitrate=VIDEO_BITRATE,
+                            threads=ENCODER_THREADS):
+    """標準入力からBGRAの生フレームを受け取り、1回でエンコードするFFmpegのコマンドを作成する"""
+    width, height = size
+    return [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "rawvideo",
+        "-pix_fmt", "bgra",
+        "-s", f"{width}x{height}",
+        "-framerate", str(fps),
+        "-i", "pipe:0",
+        "-c:v", codec,
+        "-b:v", bitrate,
+        "-threads", str(threads),
+        "-pix_fmt", "yuv420p",  # 再生環境の互換性のため
+        "-fflags", "+bitexact",
+        "-flags:v", "+bitexact",
+        filename
+    ]
+
+class StreamingRecorder:
+    """
+    フレームをバックグラウンドのエンコーダスレッドへ渡して逐次書き込むレコーダー
+    
+    キューの長さに上限があるため、レースの長さに関係なくメモリ使用量は一定。
+    キューが満杯の場合はエンコーダが追いつくまでcapture()が待機する。
+    FFmpegがあればBGRAの生フレームをパイプで1つのFFmpegプロセスに渡して
+    VIDEO_CODECで1回だけエンコードし、なければOpenCVのmp4vで書き込む。
+    
+    動画のkフレーム目はシミュレーション時間k/fps秒の状態を表す。frames_due()で
+    書き出すべきフレーム数を求め、その数だけcapture()で書き込む（0なら描画も不要）。
+    """
+    def __init__(self, filename, fps, size, queue_size=RECORDER_QUEUE_SIZE):
+        self.filename = filename
+        self.fps = fps
+        self.frame_count = 0
+        self.error = None
+        self._writer = None
+        self._process = None
+        
+        if shutil.which("ffmpeg"):
+            self._process = subprocess.Popen(ffmpeg_rawvideo_command(filename, fps, size),
+                                             stdin=subprocess.PIPE)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self._writer = cv2.VideoWriter(filename, fourcc, fps, size)
+            if not self._writer.isOpened():
+                raise IOError(f"VideoWriterを開けませんでした: {filename}")
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+    
+    def frames_due(self, sim_time):
+        """
+        シミュレーション時間sim_timeまでに書き出すべき残りのフレーム数を返す
+        
+        物理演算のステップが動画より細かければ0（このステップは書き出さない）、
+        粗ければ2以上（同じフレームを複数回書き出す）になる。
+        """
+        # 浮動小数点の誤差でちょうどフレームの時刻を取りこぼさないよう僅かに余裕を持たせる
+        target = math.floor(sim_time * self.fps + 1e-6) + 1
+        return max(0, target - self.frame_count)
+    
+    def capture(self, surface, count=1):
+        """サーフェスの内容をコピーし、count個のフレームとしてエンコーダへ渡す"""
+        # エンコーダスレッドは非同期に書き込み、その間に画面は次のフレームで上書きされるため、
+        # ここでコピーを取る。BGRA形式ならピクセルバッファのコピー1回だけで済み、
+        # 中間のコピーは作らない（色変換が必要な場合もエンコーダ側で行う）
+        frame = surface_bgra_view(surface)
+        if frame is not None:
+            frame = frame.copy()
+        else:
+            frame = pygame.surfarray.array3d(surface)
+        for _ in range(count):
+            self._queue.put(frame)  # 同じフレームを繰り返す場合は配列を共有する
+        self.frame_count += count
+    
+    def _encode_loop(self):
+        """エンコーダスレッド: キューからフレームを取り出して書き込む"""
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # エラー後はキューを空にするだけ
+            try:
+                if frame.shape[2] != 4:
+                    frame = frame.transpose([1, 0, 2])  # PyGameの配列をOpenCVの形式に変換
+                    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGRA)  # RGBからBGRAに変換
+                if self._process is not None:
+                    self._process.stdin.write(frame)  # BGRAのままFFmpegへ渡す
+                else:
+                    self._writer.write(cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR))
+            except Exception as e:
+                self.error = e
+                print(f"フレームエンコードエラー: {e}")
+    
+    def close(self):
+        """残りのフレームを書き出してファイルを閉じる。書き込んだフレーム数を返す"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._process is not None:
+            # 標準入力を閉じるとFFmpegが残りのフレームをエンコードして終了する
+            try:
+                self._process.stdin.close()
+            except OSError as e:
+                if self.error is None:
+                    self.error = e
+            returncode = self._process.wait()
+            if returncode != 0 and self.error is None:
+                self.error = subprocess.CalledProcessError(returncode, "ffmpeg")
+        else:
+            self._writer.release()
+        return self.frame_count
+
+def load_bgm_pcm(path=BGM_FILE):
+    """
+    BGMをデコードしたPCM（int16, 形状は(サンプル数, チャンネル数)）を返す
+    
+    デコード結果はプロセス内と、ファイルのハッシュをキーにしたディスク上の
+    キャッシュに保存されるため、FFmpegでのデコードは初回の1回だけになる。
+    """
+    if path in _bgm_pcm_cache:
+        return _bgm_pcm_cache[path]
+    
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cache_file = os.path.join(
+        tempfile.gettempdir(),
+        f"bgm_pcm_{digest}_{BGM_SAMPLE_RATE}_{BGM_CHANNELS}.npy"
+    )
+    
+    if os.path.exists(cache_file):
+        pcm = np.load(cache_file)
+    else:
+        print(f"BGMをデコードしています: {path}")
+        decode_cmd = [
+            "ffmpeg", "-v", "error",
+            "-i", path,
+            "-f", "s16le",
+            "-acodec", "pcm_s16le",
+            "-ar", str(BGM_SAMPLE_RATE),
+            "-ac", str(BGM_CHANNELS),
+            "pipe:1"
+        ]
+        result = subprocess.run(decode_cmd, check=True, capture_output=True)
+        pcm = np.frombuffer(result.stdout, dtype=np.int16).reshape(-1, BGM_CHANNELS)
+        
+        # 並列実行中の他プロセスが書きかけのファイルを読まないよう、書き込み後に置き換える
+        temp_file = f"{cache_file}.{os.getpid()}.tmp.npy"
+        np.save(temp_file, pcm)
+        os.replace(temp_file, cache_file)
+    
+    _bgm_pcm_cache[path] = pcm
+    return pcm
+
+def mux_bgm(video_path, output_path, frame_count):
+    """
+    無音動画にBGMを付けて出力する
+    
+    キャッシュしたPCMをメモリ上で動画の長さちょうどのサンプル数までループさせ、
+    パイプ経由で1回のFFmpeg呼び出しに渡す（映像は再エンコードしない）。
+    """
+    pcm = load_bgm_pcm()
+    sample_count = round(frame_count * BGM_SAMPLE_RATE / VIDEO_FPS)
+    looped = np.resize(pcm, (sample_count, BGM_CHANNELS))  # 先頭から繰り返して埋める
+    
+    mux_cmd = [
+        "ffmpeg", "-y",
+        "-i", video_path,
+        "-f", "s16le",
+        "-ar", str(BGM_SAMPLE_RATE),
+        "-ac", str(BGM_CHANNELS),
+        "-i", "pipe:0",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-strict", "experimental",  # 古いFFmpeg用の設定
+        "-map", "0:v",
+        "-map", "1:a",
+        "-b:a", "192k",
+        *BITEXACT_FLAGS,
+        output_path
+    ]
+    subprocess.run(mux_cmd, input=looped.tobytes(), check=True, capture_output=True)
+
+def preload_bgm():
+    """複数のレースで使い回すため、BGMのPCMキャッシュを事前に作成する"""
+    if not (AUDIO_EXPORT_ENABLED and os.path.exists(BGM_FILE)):
+        return
+    try:
+        load_bgm_pcm()
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"BGMのデコードに失敗しました: {e}")
+
+def initialize_pygame(headless=False):
+    """
+    Pygameの初期化を行う関数
+    
+    headless=Trueの場合はSDLのダミードライバを使用し、
+    ウィンドウ表示と音声再生を行わない
+    """
+    global pygame_initialized, headless_mode, screen, clock, collision_sound, goal_sound
     
     if not pygame_initialized:
+        headless_mode = headless
+        if headless:
+            # ウィンドウ・音声デバイスなしで動作させる
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+        
         pygame.init()
-        mixer.init()
         screen = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("物理演算シミュレーション")
         clock = pygame.time.Clock()
         
+        if headless:
+            # ヘッドレスモードでは効果音・BGMを読み込まない
+            collision_sound = None
+            goal_sound = None
+            pygame_initialized = True
+            return
+        
+        mixer.init()
+        
         # サウンドの初期化
         if os.path.exists(BGM_FILE):
             mixer.music.load(BGM_FILE)
@@ -216,6 +1306,9 @@ def create_obstacles(margin):
             'color': (255, 0, 0),
             'velocity': (0, 5),
             'move_range': (margin, margin + BOX_SIZE),
+            'start_time': WALL_START_TIME,     # 移動開始時刻（秒）
+            'duration': WALL_MOVE_DURATION,    # move_rangeを移動する秒数
+            'length': BOX_SIZE,
             'thickness': 5,
             'sound': 'assets/sounds/block_bounce.wav'
         },
@@ -225,6 +1318,7 @@ def create_obstacles(margin):
             'color': (0, 0, 255),
             'amplitude': 50,
             'speed': 0.05,
+            'length': 100,
             'thickness': 5,
             'sound': 'assets/sounds/metal_bounce.wav'
         },
@@ -232,7 +1326,7 @@ def create_obstacles(margin):
             'type': 'horizontal_patrolling',
             'position': (margin + BOX_SIZE//2, margin + BOX_SIZE - 20),
             'color': (0, 255, 0),
-            'velocity': (2, 0),
+            'velocity': (5, 0),
             'move_range': (margin + 50, margin + BOX_SIZE - 50),
             'length': 100,
             'thickness': 5,
@@ -248,13 +1342,27 @@ def setup_map():
     goal_rect = pygame.Rect(WIDTH//2 - 30, margin + BOX_SIZE - 20, 60, 20)
     return margin, box_rect, goal_rect
 
-def main(record=RECORD_VIDEO, block_count=DEFAULT_BLOCK_COUNT):
-    """メインゲームループ"""
+def main(record=RECORD_VIDEO, block_count=DEFAULT_BLOCK_COUNT, seed=None, dirty_rects=False):
+    """
+    メインゲームループ
+    
+    seedを指定すると乱数が固定され、同じseedなら同じレース（同じ動画）になる。
+    ヘッドレスモードではフレームレート制限なしでシミュレーション時間を進める。
+    dirty_rects=Trueの場合は変化した領域だけを描き直して画面に転送する
+    （DirtyRectRenderer）。
+    """
     global screen, clock
     
     # Pygameの初期化
     initialize_pygame()
     
+    # 乱数シードの設定（再現性のため）
+    if seed is not None:
+        random.seed(seed)
+    
+    # シミュレーション時間のクロック（ヘッドレス時は待機なし）
+    sim_clock = SimulationClock(FPS, realtime=not headless_mode)
+    
     # OpenCVがインポートできなかった場合は強制的に記録をオフに
     if not VIDEO_EXPORT_ENABLED:
         record = False
@@ -264,15 +1372,27 @@ def main(record=RECORD_VIDEO, block_count=DEFAULT_BLOCK_COUNT):
     box_rect = pygame.Rect(margin, margin, BOX_SIZE, BOX_SIZE)
     
     # 動画出力の設定
-    frames = []
+    recorder = None
     video_filename = None
     
     if record:
         try:
             # 現在時刻をファイル名に含める
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            video_filename = f"{VIDEO_DIR}/simulation_{timestamp}.mp4"
+            # 同じ秒に複数のレースが終わっても衝突しないようマイクロ秒とシードを含める
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            seed_suffix = f"_seed{seed}" if seed is not None else ""
+            video_filename = f"{VIDEO_DIR}/simulation_{timestamp}{seed_suffix}.mp4"
             os.makedirs(VIDEO_DIR, exist_ok=True)
+            
+            # 無音動画を逐次書き込む（FFmpegがあればパイプで1回だけエンコード）
+            temp_video_path = video_filename
+            if AUDIO_EXPORT_ENABLED:
+                # 一時ファイル名を使用
+                temp_dir = tempfile.mkdtemp()
+                temp_video_path = os.path.join(temp_dir, "temp_video.mp4")
+            
+            print(f"動画を保存しています: {temp_video_path}")
+            recorder = StreamingRecorder(temp_video_path, VIDEO_FPS, (WIDTH, HEIGHT))
         except Exception as e:
             print(f"動画設定エラー: {e}")
             record = False
@@ -282,39 +1402,43 @@ def main(record=RECORD_VIDEO, block_count=DEFAULT_BLOCK_COUNT):
     goal_height = 20
     goal_rect = pygame.Rect(WIDTH//2 - goal_width//2, margin + BOX_SIZE - goal_height, goal_width, goal_height)
     
-    # ブロック数の調整（1～12個まで）
-    block_count = max(1, min(block_count, len(BLOCK_COLORS)))
+    # ブロック数の調整（色の数を超える場合は色を繰り返して使う）
+    block_count = max(1, block_count)
     
-    # ブロックの初期化
+    # ブロックの初期化（全ブロックで1つのBlockSwarmを共有）
+    swarm = BlockSwarm()
     blocks = []
     for i in range(block_count):
         # ブロックの位置をランダムに配置（箱の内側）
         x = random.randint(margin + 50, margin + BOX_SIZE - 50)
         y = random.randint(margin + 50, margin + BOX_SIZE - 50)
-        blocks.append(Block(x, y, BLOCK_COLORS[i], i))
+        blocks.append(Block(x, y, BLOCK_COLORS[i % len(BLOCK_COLORS)], i, swarm))
     
     # ゲームループ
     winner = None
     running = True
-    game_start_time = time.time()
     win_time = None
     
+    # ブロード・フェーズの効果確認用（フレームあたりのペア判定数）
+    pair_test_total = 0
+    pair_test_max = 0
+    stepped_frames = 0
+    
     # マップと障害物の初期化
     margin, box_rect, goal_rect = setup_map()
     obstacles = create_obstacles(margin)
-    start_time = pygame.time.get_ticks()
     
-    # 障害物の状態管理用変数
-    obstacle_states = {
-        'horizontal_moving': {'active': False, 'start_time': 0},
-        'vertical_oscillating': {'phase': 0},
-        'horizontal_patrolling': {'x': margin + BOX_SIZE//2}
-    }
+    # 障害物の生成（状態はレース中ずっと保持される）
+    obstacle_field = ObstacleField(obstacles)
+    
+    # 描画方法の選択（箱の枠とゴールはレンダラーが描画する）
+    renderer_class = DirtyRectRenderer if dirty_rects else FullFrameRenderer
+    renderer = renderer_class(screen, box_rect, goal_rect)
+    overlays = []
     
     while running:
-        # 現在時間の取得
-        current_time = pygame.time.get_ticks()
-        elapsed_seconds = (current_time - start_time) / 1000  # ミリ秒から秒に変換
+        # 現在時間の取得（シミュレーション時間、秒）
+        current_time = sim_clock.time
         
         # イベント処理
         for event in pygame.event.get():
@@ -324,265 +1448,116 @@ def main(record=RECORD_VIDEO, block_count=DEFAULT_BLOCK_COUNT):
                 if event.key == pygame.K_ESCAPE:
                     running = False
                 elif event.key == pygame.K_r:
-                    # リセット
-                    return main()
-        
-        # 画面クリア
-        screen.fill(BACKGROUND_COLOR)
-        
-        # 複数の動く壁の処理
-        # 壁関連変数の初期化
-        moving_wall_length = 100  # 水平移動壁の長さ
-        moving_wall_x = margin + BOX_SIZE//2  # 水平移動壁の初期X位置
-        moving_wall_dx = 2  # 水平移動壁の速度
-        wall_started = False  # 上部移動壁の動作開始フラグ
-        oscillating_phase = 0  # 振動壁の位相
-        
-        # 上部移動壁（上から下へ）
-        moving_wall_y = None  # デフォルト値で初期化
-        if elapsed_seconds >= 3 and not wall_started:  # 3秒後に移動開始
-            wall_started = True
-            wall_start_time = current_time
-        
-        if wall_started:
-            wall_elapsed = (current_time - wall_start_time) / 1000
-            progress = min(wall_elapsed / 5, 1.0)  # 最大5秒かけて移動
-            moving_wall_y = margin + (BOX_SIZE * progress)
-            pygame.draw.line(screen, (255, 0, 0),  # 赤色に変更
-                           (margin, moving_wall_y), 
-                           (margin + BOX_SIZE, moving_wall_y), 5)  # 太さを5に
-                
-            # 赤い壁との衝突判定（移動終了後も壁を維持）
-            wall_rect = pygame.Rect(margin, moving_wall_y - 2, BOX_SIZE, 5)
-            for block in blocks:
-                if block.rect.colliderect(wall_rect):
-                    block.dy = abs(block.dy)  # 下向きに反射
-                    if collision_sound:
-                        collision_sound.play()
+                    # リセット（録画中の動画は破棄）
+                    if recorder:
+                        recorder.close()
+                        if AUDIO_EXPORT_ENABLED:
+                            shutil.rmtree(temp_dir, ignore_errors=True)
+                        elif os.path.exists(temp_video_path):
+                            # 音声なしの場合は動画フォルダへ直接書き込んでいるので削除する
+                            os.remove(temp_video_path)
+                    return main(record=record, block_count=block_count, dirty_rects=dirty_rects)
         
-        # 下部水平移動壁（左右に往復）速度向上
-        moving_wall_dx = 5  # 移動速度を2→5に
-        moving_wall_x += moving_wall_dx
-        if moving_wall_x < margin + 50 or moving_wall_x > margin + BOX_SIZE - 50:
-            moving_wall_dx *= -1
-        pygame.draw.line(screen, (0, 255, 0),  # 緑色
-                       (moving_wall_x - moving_wall_length//2, margin + BOX_SIZE - 20),
-                       (moving_wall_x + moving_wall_length//2, margin + BOX_SIZE - 20), 5)
-        
-        # 緑の壁との衝突判定
-        wall_rect = pygame.Rect(moving_wall_x - moving_wall_length//2, 
-                              margin + BOX_SIZE - 20 - 2, 
-                              moving_wall_length, 5)
-        for block in blocks:
-            if block.rect.colliderect(wall_rect):
-                block.dy = -abs(block.dy)  # 上向きに反射
-                if collision_sound:
-                    collision_sound.play()
-        
-        # 左側振動壁（正弦波状に上下）
-        oscillating_phase += 0.05
-        oscillating_wall_y = margin + BOX_SIZE//2 + 50 * math.sin(oscillating_phase)
-        pygame.draw.line(screen, (0, 0, 255),  # 青色
-                       (margin + 20, oscillating_wall_y - 50),
-                       (margin + 20, oscillating_wall_y + 50), 5)
-        
-        # 青い壁との衝突判定
-        wall_rect = pygame.Rect(margin + 20 - 2, oscillating_wall_y - 50, 5, 100)
-        for block in blocks:
-            if block.rect.colliderect(wall_rect):
-                block.dx = abs(block.dx)  # 右向きに反射
-                if collision_sound:
-                    collision_sound.play()
-        
-        # 通常の壁の描画（移動壁がある場合は上の壁は描画しない）
-        if not wall_started or moving_wall_y is None:
-            pygame.draw.rect(screen, BOX_COLOR, box_rect, 2)
-        else:
-            # 左、右、下の壁のみ描画
-            pygame.draw.line(screen, BOX_COLOR, (margin, margin), (margin, margin + BOX_SIZE), 2)  # 左
-            pygame.draw.line(screen, BOX_COLOR, (margin + BOX_SIZE, margin), (margin + BOX_SIZE, margin + BOX_SIZE), 2)  # 右
-            pygame.draw.line(screen, BOX_COLOR, (margin, margin + BOX_SIZE), (margin + BOX_SIZE, margin + BOX_SIZE), 2)  # 下
+        # 障害物を1ステップ進め、全ブロックとの衝突をタイプごとに一括判定
+        obstacle_field.step(current_time)
+        if obstacle_field.collide(swarm) and collision_sound:
+            collision_sound.play()
         
-        # ゴールの描画
-        pygame.draw.rect(screen, GOAL_COLOR, goal_rect)
+        # 上部移動壁が動作中の場合は箱の上端の代わりになる
+        moving_wall_y = obstacle_field.ceiling_y()
         
-        # ブロックの更新と描画
-        for block in blocks:
-            if not winner and block.update(box_rect, goal_rect, blocks, moving_wall_y):
-                winner = block.index
-            block.draw(screen)
+        # ブロックの更新（勝者が決まるまで全ブロックを一括で更新）
+        if winner is None:
+            goal_index, collided = swarm.step(box_rect, goal_rect, moving_wall_y, obstacle_field)
+            pair_test_total += swarm.pair_tests
+            pair_test_max = max(pair_test_max, swarm.pair_tests)
+            stepped_frames += 1
+            if collided and collision_sound:
+                collision_sound.play()
+            if goal_index is not None:
+                winner = blocks[goal_index].index
+                if goal_sound:
+                    goal_sound.play()
         
-        # 勝者表示
-        if winner is not None:
+        # 勝者表示（テキストは勝者が決まったときに1度だけ生成する）
+        if winner is not None and not overlays:
             font = pygame.font.SysFont(None, 72)
-            win_color = BLOCK_COLORS[winner]
+            win_color = BLOCK_COLORS[winner % len(BLOCK_COLORS)]
             # 色の名前を取得
-            color_name = COLOR_NAMES[winner]
+            color_name = COLOR_NAMES[winner % len(COLOR_NAMES)]
             text = font.render(f"{color_name} Win!", True, win_color)
-            text_rect = text.get_rect(center=(WIDTH//2, HEIGHT//2))
-            screen.blit(text, text_rect)
+            overlays.append((text, text.get_rect(center=(WIDTH//2, HEIGHT//2))))
             
             # リスタート案内
             font_small = pygame.font.SysFont(None, 36)
             restart_text = font_small.render("Press R to restart", True, (200, 200, 200))
-            restart_rect = restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 50))
-            screen.blit(restart_text, restart_rect)
+            overlays.append((restart_text, restart_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 50))))
         
-        # 画面更新
-        pygame.display.flip()
+        # 録画中は、シミュレーション時間の1/VIDEO_FPS秒ごとの動画フレームに
+        # 当たるステップだけを描画する（録画なしの場合は画面表示のために毎ステップ描画）
+        frames_due = recorder.frames_due(current_time) if record else 0
+        if frames_due or not (record or headless_mode):
+            # 障害物・箱・ゴール・ブロック・勝者表示の描画
+            dirty = renderer.render(obstacle_field, blocks, moving_wall_y, overlays)
+            
+            # 画面更新（ヘッドレス時は表示先がないため省略）
+            if not headless_mode:
+                renderer.present(dirty)
         
-        # 動画フレームのキャプチャ
-        if record:
+        # 動画フレームのキャプチャ（エンコードはバックグラウンドで実行）
+        if frames_due:
             try:
-                frame = pygame.surfarray.array3d(screen)
-                frame = frame.transpose([1, 0, 2])  # PyGameの配列をOpenCVの形式に変換
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)  # RGBからBGRに変換
-                frames.append(frame)
+                recorder.capture(screen, frames_due)
             except Exception as e:
                 print(f"フレームキャプチャエラー: {e}")
         
-        # 時間管理
-        current_game_time = time.time() - game_start_time
+        # 時間管理（シミュレーション時間を1ステップ進める）
+        sim_clock.tick()
+        current_game_time = sim_clock.time
         
         # 勝者が決まったらwin_timeを記録
         if winner is not None and win_time is None:
-            win_time = time.time()
+            win_time = current_game_time
+            print(f"勝者: {COLOR_NAMES[winner % len(COLOR_NAMES)]} ({win_time:.2f}秒)")
         
         # 終了条件: 勝利後5秒経過 または 2分経過
-        if (win_time is not None and time.time() - win_time >= WIN_DISPLAY_TIME) or \
+        if (win_time is not None and current_game_time - win_time >= WIN_DISPLAY_TIME) or \
            current_game_time >= MAX_GAME_TIME:
             running = False
-        
-        clock.tick(FPS)
     
-    # 動画の保存
-    if record and frames:
+    # ブロック同士のペア判定数を表示（総当たりの場合との比較）
+    if stepped_frames:
+        brute_force = block_count * (block_count - 1) // 2
+        print(f"ペア判定数/フレーム: 平均 {pair_test_total / stepped_frames:.1f}, "
+              f"最大 {pair_test_max}（総当たり: {brute_force}）")
+    
+    # 動画の保存（残りのフレームを書き出して無音動画を完成させる）
+    frame_count = recorder.close() if record else 0
+    if record and frame_count:
         try:
-            # OpenCVで無音動画を作成
-            temp_video_path = video_filename
-            if AUDIO_EXPORT_ENABLED:
-                # 一時ファイル名を使用
-                temp_dir = tempfile.mkdtemp()
-                temp_video_path = os.path.join(temp_dir, "temp_video.mp4")
-                
-            print(f"動画を保存しています: {temp_video_path}")
-            height, width = frames[0].shape[:2]
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            video = cv2.VideoWriter(temp_video_path, fourcc, VIDEO_FPS, (width, height))
-            
-            for frame in frames:
-                video.write(frame)
-            
-            video.release()
+            if recorder.error is not None:
+                raise recorder.error
             
             # 音声を追加（FFmpegが必要）
             if AUDIO_EXPORT_ENABLED and os.path.exists(BGM_FILE):
                 print("FFmpegを使用して音声を追加しています...")
-                
-                # BGMをループさせて動画の長さに合わせる
-                # FFmpeg 2.8.4には-stream_loopオプションがないため、別の方法でループさせる
-                movie_duration = len(frames) / VIDEO_FPS
-                print(f"動画の長さ: {movie_duration}秒")
-                
-                # まずMP3をWAVに変換する（古いFFmpegでの互換性のため）
-                convert_cmd = [
-                    "ffmpeg", "-y",
-                    "-i", BGM_FILE,
-                    "-c:a", "pcm_s16le",
-                    "-ar", "44100",
-                    f"{temp_dir}/original_bgm.wav"
-                ]
-                
+                print(f"動画の長さ: {frame_count / VIDEO_FPS}秒")
                 try:
-                    subprocess.run(convert_cmd, check=True)
-                    print("BGMをWAVに変換しました")
-                    
-                    # 次にループ処理（古いバージョン対応）
-                    loop_cmd = [
-                        "ffmpeg", "-y",
-                        "-i", f"{temp_dir}/original_bgm.wav",
-                        "-filter_complex", f"aloop=loop=-1:size=2147483647",
-                        "-t", str(movie_duration),
-                        "-c:a", "pcm_s16le",
-                        "-ar", "44100",
-                        f"{temp_dir}/looped_bgm.wav"
-                    ]
-                    
-                    subprocess.run(loop_cmd, check=True)
-                    print("BGMをループして一時ファイルに保存しました")
-                except subprocess.CalledProcessError as e:
-                    print(f"BGMループ作成エラー: {e.stderr if hasattr(e, 'stderr') else e}")
-                
-                # 出力設定
-                if os.path.exists(f"{temp_dir}/looped_bgm.wav"):
-                    # ループしたBGMを使用（古いFFmpegに対応したコマンド）
-                    ffmpeg_cmd = [
-                        "ffmpeg", "-y",
-                        "-i", temp_video_path,
-                        "-i", f"{temp_dir}/looped_bgm.wav",
-                        "-c:v", "copy",
-                        "-c:a", "aac",
-                        "-strict", "experimental",  # 古いFFmpeg用の設定
-                        "-map", "0:v",
-                        "-map", "1:a",
-                        "-b:a", "192k",  # ビットレートを指定
-                        "-ac", "2",      # ステレオ音声
-                        video_filename
-                    ]
-                else:
-                    # 変換とループに失敗した場合：直接BGMを使用
-                    print("BGMをループできませんでした。オリジナルのBGMを使用します。")
-                    ffmpeg_cmd = [
-                        "ffmpeg", "-y",
-                        "-i", temp_video_path,
-                        "-i", BGM_FILE,
-                        "-c:v", "copy",
-                        "-c:a", "aac",
-                        "-strict", "experimental",  # 古いFFmpeg用の設定
-                        "-map", "0:v",
-                        "-map", "1:a",
-                        "-b:a", "192k",
-                        "-ac", "2",
-                        "-shortest",
-                        video_filename
-                    ]
-                
-                try:
-                    print("FFmpegコマンドを実行中:", " ".join(ffmpeg_cmd))
-                    result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+                    mux_bgm(temp_video_path, video_filename, frame_count)
                     print(f"音声付き動画の保存が完了しました: {video_filename}")
-                    
-                    # 一時ファイルの削除
-                    if os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir)
-                except subprocess.CalledProcessError as e:
+                except (subprocess.CalledProcessError, OSError) as e:
                     print(f"FFmpegエラー: {e}")
-                    print(f"エラー出力: {e.stderr.decode('utf-8', errors='ignore') if hasattr(e, 'stderr') else '不明'}")
+                    if isinstance(e, subprocess.CalledProcessError) and e.stderr:
+                        print(f"エラー出力: {e.stderr.decode('utf-8', errors='ignore')}")
+                    # 音声付加に失敗した場合は元の動画を使用
                     print(f"音声なしで動画を保存します: {video_filename}")
-                    
-                    # より単純なコマンドで再試行
-                    try:
-                        simple_cmd = [
-                            "ffmpeg", "-y",
-                            "-i", temp_video_path,
-                            "-i", BGM_FILE,
-                            "-c:v", "copy",
-                            "-c:a", "aac",
-                            "-strict", "experimental",
-                            video_filename
-                        ]
-                        print("単純化したコマンドで再試行:", " ".join(simple_cmd))
-                        subprocess.run(simple_cmd, check=True)
-                        print("単純化したコマンドでの音声付き動画の作成に成功しました")
-                    except Exception as e2:
-                        print(f"再試行も失敗: {e2}")
-                        # 音声付加に失敗した場合は元の動画を使用
-                        if temp_video_path != video_filename:
-                            shutil.copy(temp_video_path, video_filename)
-                    
-                    if os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir)
+                    shutil.copy(temp_video_path, video_filename)
+                finally:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
             else:
+                if temp_video_path != video_filename:
+                    shutil.copy(temp_video_path, video_filename)
+                    shutil.rmtree(temp_dir, ignore_errors=True)
                 print(f"動画の保存が完了しました: {video_filename} (音声なし)")
         except Exception as e:
             print(f"動画保存エラー: {e}")
@@ -594,18 +1569,196 @@ def main(record=RECORD_VIDEO, block_count=DEFAULT_BLOCK_COUNT):
     
     return video_filename
 
-def run_multiple_simulations(count, record=RECORD_VIDEO):
-    """複数回シミュレーションを実行し、複数の動画を生成する関数"""
+def run_monte_carlo(races, seed=0, block_count=DEFAULT_BLOCK_COUNT, frames_per_step=1):
+    """
+    描画なしでレースを多数実行し、結果を集計する
+    
+    各レースをBlockSwarmの1レーンとして全レースを同時に進める。
+    レースiの初期配置はシードseed + iのmain()と同じ乱数列から生成され、
+    物理演算も同じBlockSwarm/ObstacleFieldを使うため、気になるレースは
+    python main.py --seed <シード> で動画として再現できる。
+    
+    frames_per_step を大きくすると1ステップでその分のフレームを進める。
+    壁との衝突は時刻を求めて解決するためすり抜けは起きないが、
+    ブロック同士の衝突の細部が変わるため結果はmain()と一致しなくなる。
+    
+    Returns:
+        dict: seeds（各レースのシード）, winners（勝者のブロック番号、
+              タイムアウトは-1）, finish_times（ゴール時刻、タイムアウトはNaN）,
+              win_counts / win_rates（色ごと）, timeouts（タイムアウト数）
+    """
+    margin, box_rect, goal_rect = setup_map()
+    seeds = np.arange(seed, seed + races)
+    
+    # main()と同じ順序で乱数を使い、各レーンの初期配置を生成する
+    swarm = BlockSwarm()
+    block_ids = []
+    for lane, lane_seed in enumerate(seeds.tolist()):
+        rng = random.Random(lane_seed)
+        for i in range(block_count):
+            x = rng.randint(margin + 50, margin + BOX_SIZE - 50)
+            y = rng.randint(margin + 50, margin + BOX_SIZE - 50)
+            angle = rng.choice([45, 135, 225, 315])
+            swarm.add(x, y, 6 * math.cos(math.radians(angle)), 6 * math.sin(math.radians(angle)),
+                      BLOCK_SIZE, lane)
+            block_ids.append(i)
+    block_ids = np.array(block_ids, dtype=np.int64)
+    
+    obstacle_field = ObstacleField(create_obstacles(margin))
+    sim_clock = SimulationClock(FPS / frames_per_step, realtime=False)
+    winners = np.full(races, -1, dtype=np.int64)
+    finish_times = np.full(races, np.nan)
+    
+    while len(swarm) and sim_clock.time < MAX_GAME_TIME:
+        # main()のゲームループと同じ順序で更新する
+        obstacle_field.step(sim_clock.time, frames_per_step)
+        obstacle_field.collide(swarm)
+        was_reached = swarm.reached_goal.copy()
+        swarm.step(box_rect, goal_rect, obstacle_field.ceiling_y(), obstacle_field,
+                   frames_per_step)
+        sim_clock.tick()
+        
+        reached = swarm.reached_goal & ~was_reached
+        if reached.any():
+            # 同じフレームで複数ゴールした場合はブロック番号の小さい方が勝者
+            lanes, first = np.unique(swarm.lane[reached], return_index=True)
+            winners[lanes] = block_ids[reached][first]
+            finish_times[lanes] = sim_clock.time
+            
+            # 勝者が決まったレーンはそこで止まるので、以降の計算から外す
+            keep = ~np.isin(swarm.lane, lanes)
+            swarm.select(keep)
+            block_ids = block_ids[keep]
+    
+    color_count = min(block_count, len(BLOCK_COLORS))
+    finished = winners >= 0
+    win_counts = np.bincount(winners[finished] % len(BLOCK_COLORS), minlength=color_count)
+    return {
+        "seeds": seeds,
+        "winners": winners,
+        "finish_times": finish_times,
+        "win_counts": win_counts,
+        "win_rates": win_counts / races,
+        "timeouts": int(np.count_nonzero(~finished)),
+    }
+
+def print_monte_carlo_report(result):
+    """run_monte_carloの結果を表示する"""
+    races = len(result["seeds"])
+    winners = result["winners"]
+    times = result["finish_times"]
+    
+    print(f"\n=== モンテカルロ集計（{races}レース、シード "
+          f"{result['seeds'][0]}〜{result['seeds'][-1]}） ===")
+    for color, (wins, rate) in enumerate(zip(result["win_counts"], result["win_rates"])):
+        color_times = times[(winners >= 0) & (winners % len(BLOCK_COLORS) == color)]
+        mean_time = f"{color_times.mean():.2f}秒" if len(color_times) else "-"
+        print(f"{COLOR_NAMES[color]:>8}: 勝率 {rate * 100:5.1f}% ({wins}勝), 平均ゴール時間 {mean_time}")
+    
+    finished_times = times[~np.isnan(times)]
+    if len(finished_times):
+        p10, p50, p90 = np.percentile(finished_times, [10, 50, 90])
+        print(f"ゴール時間: 平均 {finished_times.mean():.2f}秒, "
+              f"10% {p10:.2f}秒, 中央値 {p50:.2f}秒, 90% {p90:.2f}秒")
+        counts, edges = np.histogram(finished_times, bins=10)
+        for count, low, high in zip(counts, edges[:-1], edges[1:]):
+            print(f"  {low:6.2f}〜{high:6.2f}秒: {count}")
+    print(f"タイムアウト（{MAX_GAME_TIME}秒）: {result['timeouts']}レース")
+
+def _init_worker():
+    """ワーカープロセスの初期化（プロセスごとにヘッドレスでPygameを初期化）"""
+    initialize_pygame(headless=True)
+
+def _run_race_in_worker(index, record, seed, block_count):
+    """
+    ワーカープロセスで1レースを実行する
+    
+    Returns:
+        tuple: (レース番号, 動画ファイル名, エラーメッセージ)
+    """
+    try:
+        video_filename = main(record=record, block_count=block_count, seed=seed)
+        return index, video_filename, None
+    except Exception as e:
+        return index, None, f"{type(e).__name__}: {e}"
+
+def run_parallel_simulations(count, jobs, record=RECORD_VIDEO, seed=None,
+                             block_count=DEFAULT_BLOCK_COUNT):
+    """
+    複数のレースをプロセスプールで並列に実行する
+    
+    各ワーカーはヘッドレスで動作し、i番目のレースはseed + iで実行される。
+    結果はレース番号順に返し、失敗したレースはエラー内容を表示する。
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # 各レースに異なるシードを割り当てる
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**31)
+    
+    print(f"合計{count}個の動画を{jobs}プロセスで並列に生成します（シード: {seed}〜{seed + count - 1}）...")
+    
+    # ディスク上のBGMキャッシュを先に作り、各ワーカーはそれを読み込むだけにする
+    if record:
+        preload_bgm()
+    
+    # Pygameはfork後の状態共有に対応していないためspawnで起動する
+    context = multiprocessing.get_context("spawn")
+    results = [None] * count
+    errors = {}
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                             initializer=_init_worker) as executor:
+        futures = [executor.submit(_run_race_in_worker, i, record, seed + i, block_count)
+                   for i in range(count)]
+        for i, future in enumerate(futures):
+            try:
+                index, video_filename, error = future.result()
+            except Exception as e:
+                # ワーカープロセス自体が異常終了した場合
+                index, video_filename, error = i, None, f"{type(e).__name__}: {e}"
+            results[index] = video_filename
+            if error:
+                errors[index] = error
+    
+    print("\n=== 全ての動画生成が完了しました ===")
+    for i, video_filename in enumerate(results):
+        if i in errors:
+            print(f"{i+1}. (シード {seed + i}) 失敗: {errors[i]}")
+        elif video_filename:
+            print(f"{i+1}. (シード {seed + i}) {video_filename}")
+    
+    return [video_filename for video_filename in results if video_filename]
+
+def run_multiple_simulations(count, record=RECORD_VIDEO, headless=False, seed=None, jobs=1,
+                             block_count=DEFAULT_BLOCK_COUNT, dirty_rects=False):
+    """
+    複数回シミュレーションを実行し、複数の動画を生成する関数
+    
+    seedを指定した場合、i番目のレースはseed + iで実行される。
+    jobsが2以上の場合はプロセスプールで並列に実行する。
+    dirty_rectsは画面表示ありで順に実行する場合にmain()へ渡される。
+    """
+    if jobs > 1:
+        return run_parallel_simulations(count, jobs, record=record, seed=seed,
+                                        block_count=block_count)
+    
     video_files = []
     
     print(f"合計{count}個の動画を連続して生成します...")
     
     # Pygameの初期化
-    initialize_pygame()
+    initialize_pygame(headless=headless)
+    
+    # BGMは1回だけデコードし、全レースで使い回す
+    if record:
+        preload_bgm()
     
     for i in range(count):
         print(f"\n=== 動画 {i+1}/{count} の生成を開始 ===")
-        video_filename = main(record=record, block_count=DEFAULT_BLOCK_COUNT)
+        race_seed = seed + i if seed is not None else None
+        video_filename = main(record=record, block_count=block_count, seed=race_seed,
+                              dirty_rects=dirty_rects)
         if video_filename:
             video_files.append(video_filename)
     
@@ -629,17 +1782,40 @@ if __name__ == "__main__":
                         help=f'生成する動画の数（デフォルト: {DEFAULT_VIDEO_COUNT}個）')
     parser.add_argument('--no-video', action='store_true', 
                         help='動画出力を無効にする')
+    parser.add_argument('--headless', action='store_true',
+                        help='画面表示・音声なしで、実時間より高速に実行する')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='乱数シード（指定すると同じレースを再現できる）')
+    parser.add_argument('-b', '--blocks', type=int, default=DEFAULT_BLOCK_COUNT,
+                        help=f'ブロックの数（デフォルト: {DEFAULT_BLOCK_COUNT}個）')
+    parser.add_argument('--monte-carlo', type=int, default=0, metavar='N',
+                        help='描画なしでN回のレースを実行し、色ごとの勝率などを集計する')
+    parser.add_argument('--mc-step', type=int, default=1, metavar='FRAMES',
+                        help='モンテカルロ集計で1ステップに進めるフレーム数（デフォルト: 1）')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='並列実行するプロセス数（2以上でヘッドレス並列実行）')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='変化した領域だけを描き直して画面に転送する（低負荷のプレビュー向け）')
     args = parser.parse_args()
     
     try:
         # 引数に基づいてシミュレーションを実行
-        if args.count > 1:
+        if args.monte_carlo > 0:
+            # 描画なしの集計（シード未指定時は0から）
+            result = run_monte_carlo(args.monte_carlo, seed=args.seed or 0, block_count=args.blocks,
+                                     frames_per_step=args.mc_step)
+            print_monte_carlo_report(result)
+        elif args.count > 1:
             # 複数の動画を生成
-            video_files = run_multiple_simulations(args.count, record=not args.no_video)
+            video_files = run_multiple_simulations(args.count, record=not args.no_video,
+                                                   headless=args.headless, seed=args.seed,
+                                                   jobs=args.jobs, block_count=args.blocks,
+                                                   dirty_rects=args.dirty_rects)
         else:
             # 1つの動画を生成
-            initialize_pygame()
-            video_filename = main(record=not args.no_video, block_count=DEFAULT_BLOCK_COUNT)
+            initialize_pygame(headless=args.headless)
+            video_filename = main(record=not args.no_video, block_count=args.blocks,
+                                  seed=args.seed, dirty_rects=args.dirty_rects)
             pygame.quit()
             if video_filename:
                 print(f"YouTubeにアップロードできる動画が生成されました: {video_filename}")
@@ -0,0 +1,271 @@
+"""
+マーブルレースのバッチ実行と結果の集計
+
+描画せずにシード付きのレースをプロセスプールで大量に実行し、マーブルごとの
+ゴール時間・順位・状態（完走/スタック/時間切れ）をコースの乱数シードとともに
+列指向の結果ファイルへ追記する。レースはオフラインモード（main.py --offline）と
+同じ台本・同じ固定ステップで進むため、気になるシードは描画ありで同じレースを再現できる:
+
+    python main.py --offline --seed 123 --slots 2 0 3 1
+
+結果はresultsディレクトリに、実行ごとに新しいチャンク（列ごとの配列を格納した.npz）
+として追加される。既存のファイルは書き換えない。
+
+使用例:
+    python batch.py run --races 1000 --shuffle-slots     # 1000レースを実行して追記
+    python batch.py summary                              # 色別・スタート位置別の勝率
+    python batch.py summary --close 10                   # 接戦だったシード上位10件
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# 画面とサウンドデバイスを使わない
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+
+import config
+from main import MarbleRace, AUTO_MAX_RACE_SECONDS
+
+# 結果ファイルの保存先
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# この秒数の間に前進（STUCK_DISTANCEピクセル以上）しなかったマーブルはスタックとみなす
+STUCK_SECONDS = 15.0
+STUCK_DISTANCE = 20.0
+# この数のレースごとにチャンクを書き出す（途中で中断しても結果が残る）
+CHUNK_RACES = 200
+
+COLOR_NAMES = ["Red", "Blue", "Green", "Yellow"]
+# 列名と型（statusは 0: 完走, 1: スタック, 2: 時間切れ）
+COLUMNS = {
+    "course_seed": np.int64,
+    "color": np.int8,
+    "slot": np.int8,
+    "rank": np.int8,          # 着順（1〜4、完走しなかった場合は0）
+    "finish_time": np.float64,  # ゴール時間（秒、完走しなかった場合はNaN）
+    "status": np.int8,
+    "race_time": np.float64,  # レースを打ち切った時点のレース時間（秒）
+}
+STATUS_FINISHED, STATUS_STUCK, STATUS_TIMEOUT = 0, 1, 2
+STATUS_NAMES = ["完走", "スタック", "時間切れ"]
+
+
+def run_race(task):
+    """
+    1レースを描画なしで実行する（ワーカープロセスで実行）
+
+    Args:
+        task (tuple): (コースの乱数シード, スタート位置をシャッフルするか, レース時間の上限（秒）)
+
+    Returns:
+        list: マーブルごとの結果（COLUMNSと同じキーの辞書）
+    """
+    seed, shuffle_slots, time_limit = task
+    slot_order = list(range(4))
+    if shuffle_slots:
+        random.Random(seed).shuffle(slot_order)
+
+    # レース中のメッセージ（ゴール通知など）は数千レース分になるので表示しない
+    with contextlib.redirect_stdout(io.StringIO()):
+        # コースの生成（障害物の速度など）はグローバルな乱数を使う
+        random.seed(seed)
+        game = MarbleRace(offline=True, record=False, slot_order=slot_order)
+        rows = simulate(game, slot_order, seed, time_limit)
+        game.cleanup()
+    return rows
+
+
+def simulate(game, slot_order, seed, time_limit):
+    """
+    オフラインモードの台本どおりにレースを進め、マーブルごとの結果を返す
+    
+    全マーブルが完走またはスタックするか、レース時間がtime_limitに達した時点で打ち切る
+    """
+    # 前進の記録（スタック判定用）: マーブルごとの最大Y座標とそれを更新したレース時間
+    best_y = [None] * 4
+    progressed_at = [0.0] * 4
+
+    while game.running and game.race_time < time_limit:
+        game.update(game.clock.tick())
+        if game.race_state == config.STATE_FINISHED:
+            break
+        if game.race_state != config.STATE_RUNNING:
+            continue
+
+        for i, marble in enumerate(game.marbles):
+            y = marble.get_position_y()
+            if best_y[i] is None or y > best_y[i] + STUCK_DISTANCE:
+                best_y[i] = y
+                progressed_at[i] = game.race_time
+
+        # 全マーブルが完走またはスタックしたら打ち切る
+        if all(m.finished or game.race_time - progressed_at[i] >= STUCK_SECONDS
+               for i, m in enumerate(game.marbles)):
+            break
+
+    finished = sorted((m for m in game.marbles if m.finished), key=lambda m: m.finish_time)
+    rows = []
+    for i, marble in enumerate(game.marbles):
+        if marble.finished:
+            status = STATUS_FINISHED
+        elif game.race_time - progressed_at[i] >= STUCK_SECONDS:
+            status = STATUS_STUCK
+        else:
+            status = STATUS_TIMEOUT
+        rows.append({
+            "course_seed": seed,
+            "color": marble.color_index,
+            "slot": slot_order[i],
+            "rank": finished.index(marble) + 1 if marble.finished else 0,
+            "finish_time": marble.finish_time if marble.finished else np.nan,
+            "status": status,
+            "race_time": game.race_time,
+        })
+    return rows
+
+
+def write_chunk(rows, results_dir=RESULTS_DIR):
+    """
+    結果を新しいチャンクファイルとして書き出す（既存のファイルは変更しない）
+
+    Args:
+        rows (list): run_raceが返した行のリスト
+        results_dir (str): 結果ディレクトリ
+
+    Returns:
+        str: 書き出したファイルのパス
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    path = os.path.join(results_dir, f"races_{timestamp}.npz")
+    columns = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in COLUMNS.items()}
+    # 書き込み途中のファイルを読まれないよう、一時ファイルに書いてから名前を変える
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.savez(f, **columns)
+    os.replace(temp_path, path)
+    return path
+
+
+def load_results(results_dir=RESULTS_DIR):
+    """
+    すべてのチャンクを読み込み、列ごとに連結する
+
+    Args:
+        results_dir (str): 結果ディレクトリ
+
+    Returns:
+        dict: 列名 → numpy配列（同じシードのレースが複数回あれば重複したまま）
+    """
+    chunks = []
+    if os.path.isdir(results_dir):
+        for name in sorted(os.listdir(results_dir)):
+            if name.endswith(".npz"):
+                with np.load(os.path.join(results_dir, name)) as chunk:
+                    chunks.append({column: chunk[column] for column in COLUMNS})
+    return {column: np.concatenate([c[column] for c in chunks]) if chunks else np.zeros(0, dtype)
+            for column, dtype in COLUMNS.items()}
+
+
+def run_batch(races, start_seed, shuffle_slots, time_limit, workers, results_dir=RESULTS_DIR):
+    """
+    シードstart_seed〜start_seed+races-1のレースをプロセスプールで実行し、結果を追記する
+    """
+    tasks = [(seed, shuffle_slots, time_limit) for seed in range(start_seed, start_seed + races)]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    rows = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for race_rows in pool.map(run_race, tasks, chunksize=max(1, len(tasks) // (8 * workers))):
+            rows.extend(race_rows)
+            done += 1
+            if done % CHUNK_RACES == 0:
+                write_chunk(rows, results_dir)
+                rows = []
+                print(f"{done}/{races}レース完了（{time.perf_counter() - start:.1f}秒）")
+    if rows:
+        write_chunk(rows, results_dir)
+    print(f"{races}レースを{time.perf_counter() - start:.1f}秒で実行し、{results_dir}に追記しました")
+
+
+def summarize(results, close=0):
+    """
+    色別・スタート位置別の勝率と完走率を表示する
+
+    Args:
+        results (dict): load_resultsが返した列
+        close (int): 1位と2位の差が小さかったシードを表示する件数
+    """
+    race_count = len(np.unique(results["course_seed"]))
+    print(f"レース数: {race_count}（マーブル {len(results['color'])}件）")
+    if race_count == 0:
+        return
+
+    wins = results["rank"] == 1
+    finished = results["status"] == STATUS_FINISHED
+    for label, column, names in (("色", "color", COLOR_NAMES), ("スタート位置", "slot", None)):
+        print(f"\n{label}別:")
+        print(f"{label:>8} {'勝率':>7} {'完走率':>7} {'平均着順':>8} {'平均タイム':>9}")
+        for value in range(4):
+            mask = results[column] == value
+            if not mask.any():
+                continue
+            name = names[value] if names else str(value)
+            ranks = results["rank"][mask & finished]
+            times = results["finish_time"][mask & finished]
+            mean_rank = f"{ranks.mean():8.2f}" if len(ranks) else f"{'-':>8}"
+            mean_time = f"{times.mean():9.2f}" if len(times) else f"{'-':>9}"
+            print(f"{name:>8} {wins[mask].mean():7.1%} {finished[mask].mean():7.1%} {mean_rank} {mean_time}")
+
+    print("\n状態別:")
+    for status, name in enumerate(STATUS_NAMES):
+        print(f"{name:>8} {(results['status'] == status).mean():7.1%}")
+
+    if close:
+        # 1位と2位のタイム差が小さいレース（動画向きの接戦）
+        gaps = []
+        for seed in np.unique(results["course_seed"]):
+            mask = (results["course_seed"] == seed) & finished
+            times = np.sort(results["finish_time"][mask])
+            if len(times) >= 2:
+                slots = results["slot"][results["course_seed"] == seed]
+                colors = results["color"][results["course_seed"] == seed]
+                slot_order = [int(slots[colors == c][0]) for c in range(4)]
+                gaps.append((times[1] - times[0], int(seed), slot_order))
+        print(f"\n接戦だったシード（上位{close}件）:")
+        for gap, seed, slot_order in sorted(gaps)[:close]:
+            print(f"  差 {gap:6.3f}秒  python main.py --offline --seed {seed} "
+                  f"--slots {' '.join(map(str, slot_order))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='マーブルレースのバッチ実行と結果の集計')
+    parser.add_argument('--results', default=RESULTS_DIR, help=f'結果ディレクトリ（デフォルト: {RESULTS_DIR}）')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='レースを実行して結果を追記する')
+    run_parser.add_argument('--races', type=int, default=100, help='レース数（デフォルト: 100）')
+    run_parser.add_argument('--start-seed', type=int, default=0, help='最初のシード（デフォルト: 0）')
+    run_parser.add_argument('--shuffle-slots', action='store_true',
+                            help='レースごとに色とスタート位置の組み合わせをシャッフルする')
+    run_parser.add_argument('--time-limit', type=float, default=AUTO_MAX_RACE_SECONDS,
+                            help=f'レース時間の上限（秒、デフォルト: {AUTO_MAX_RACE_SECONDS:.0f}）')
+    run_parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数（デフォルト: CPU数）')
+
+    summary_parser = commands.add_parser('summary', help='色別・スタート位置別の勝率を表示する')
+    summary_parser.add_argument('--close', type=int, default=0, metavar='N',
+                                help='接戦だったシードを上位N件表示する')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run_batch(args.races, args.start_seed, args.shuffle_slots, args.time_limit, args.workers, args.results)
+    else:
+        summarize(load_results(args.results), args.close)
@@ -0,0 +1,73 @@
+import time
+import pygame
+
+class RealClock:
+    """
+    実時間の時計
+    pygame.time.Clockでフレームレートを制御し、経過時間は実時間で返す
+    """
+    def __init__(self, fps):
+        """
+        時計を初期化
+
+        Args:
+            fps (int): 目標フレームレート
+        """
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.start = time.perf_counter()
+
+    def tick(self):
+        """
+        次のフレームまで待機する
+
+        Returns:
+            float: 前回のtickからの経過時間（秒）
+        """
+        return self.clock.tick(self.fps) / 1000.0
+
+    def now(self):
+        """
+        現在時刻を取得
+
+        Returns:
+            float: 時計の作成からの経過時間（秒）
+        """
+        return time.perf_counter() - self.start
+
+
+class VirtualClock:
+    """
+    仮想時計（オフラインレンダリング用）
+    待機せずに、tickのたびに1/fps秒ずつ進む。実時間とは無関係なので、
+    処理が速ければ実時間より速く、遅くても結果は同じになる
+    """
+    def __init__(self, fps):
+        """
+        時計を初期化
+
+        Args:
+            fps (int): 1秒あたりのフレーム数（1回のtickで進む時間は1/fps秒）
+        """
+        self.fps = fps
+        self.frame_time = 1.0 / fps
+        self.frames = 0
+
+    def tick(self):
+        """
+        時計を1フレーム分進める（待機しない）
+
+        Returns:
+            float: 1フレームの時間（秒）
+        """
+        self.frames += 1
+        return self.frame_time
+
+    def now(self):
+        """
+        現在時刻を取得
+
+        Returns:
+            float: 時計の作成からの仮想経過時間（秒）
+        """
+        return self.frames * self.frame_time
@@ -2,9 +2,67 @@ import pygame
 import pymunk
 import random
 import math
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 import config
 from obstacles import StaticWall, Pin, Flipper, RotatingDisc
 
+# 静的なコース要素（壁・ピン・ゴール）を事前に描画しておくタイルの高さ（ピクセル）。
+# 画面の高さと同じなら、1フレームで描画するタイルは最大2枚
+TILE_HEIGHT = config.HEIGHT
+# 描画済みタイルを保持する数（LRU。古いものから破棄）
+TILE_CACHE_SIZE = 4
+# タイルの上下に余分に描画する幅。境界をまたぐ壁の太さやピン、GOAL文字が欠けないようにする
+TILE_MARGIN = 64
+
+
+class YIntervalIndex:
+    """
+    要素を縦方向の範囲（y_range）で検索するインデックス
+    
+    要素を上端のY座標でソートしておき、bisectで候補を絞り込む。
+    上端が「検索範囲の上端 - 最も背の高い要素の高さ」より上にある要素は
+    検索範囲に届かないため調べない。コースが長くなっても、検索のコストは
+    範囲付近の要素数にしか依存しない。
+    """
+    def __init__(self, elements):
+        """
+        インデックスを作成
+        
+        Args:
+            elements (list): y_range()を持つ要素のリスト
+        """
+        # (上端, 下端, 元の順番, 要素) を上端でソート
+        entries = sorted(
+            (element.y_range() + (order, element) for order, element in enumerate(elements)),
+            key=lambda entry: entry[0]
+        )
+        self.tops = [entry[0] for entry in entries]
+        self.bottoms = [entry[1] for entry in entries]
+        self.orders = [entry[2] for entry in entries]
+        self.elements = [entry[3] for entry in entries]
+        self.max_height = max((bottom - top for top, bottom in zip(self.tops, self.bottoms)), default=0)
+    
+    def __len__(self):
+        return len(self.elements)
+    
+    def query(self, y_min, y_max):
+        """
+        縦方向の範囲 [y_min, y_max] と重なる要素を取得
+        
+        Args:
+            y_min (float): 範囲の上端のY座標
+            y_max (float): 範囲の下端のY座標
+        
+        Returns:
+            list: 重なる要素（作成時の順番どおり。描画の重なり順が変わらないようにする）
+        """
+        first = bisect_left(self.tops, y_min - self.max_height)
+        last = bisect_right(self.tops, y_max)
+        hits = [i for i in range(first, last) if self.bottoms[i] >= y_min]
+        hits.sort(key=self.orders.__getitem__)
+        return [self.elements[i] for i in hits]
+
 class Course:
     """
     マーブルレースのコース管理クラス
@@ -30,6 +88,21 @@ class Course:
         
         # コース生成
         self.generate_course()
+        
+        # 動かない要素（壁・ピン）と、毎フレーム描画・更新する動く障害物。
+        # どちらも縦方向の範囲で検索できるようにしておく
+        self.static_elements = self.walls + [o for o in self.obstacles if o.static]
+        self.moving_obstacles = [o for o in self.obstacles if not o.static]
+        self.static_index = YIntervalIndex(self.static_elements)
+        self.moving_index = YIntervalIndex(self.moving_obstacles)
+        
+        # 動く障害物の更新時刻（範囲外で止めていた障害物を、次の更新でまとめて進める）
+        self.time = 0.0
+        self.updated_at = {obstacle: 0.0 for obstacle in self.moving_obstacles}
+        
+        # 静的レイヤーのタイル（タイル番号 → Surface、LRU順）
+        self.tiles = OrderedDict()
+        self.goal_font = None
     
     def generate_course(self):
         """コース全体を生成"""
@@ -494,47 +567,136 @@ class Course:
         """
         コースを描画
         
+        静的な要素は事前に描画したタイルを1〜2枚貼り付けるだけで、
+        個別に描画するのは動く障害物のみ
+        
         Args:
             screen (pygame.Surface): 描画対象の画面
             camera_y (int): カメラのY位置オフセット
         """
-        # 壁の描画
-        for wall in self.walls:
-            wall.draw(screen, camera_y)
+        # 壁・ピン・ゴール（静的レイヤー）
+        self.draw_static(screen, camera_y)
         
-        # 障害物の描画
-        for obstacle in self.obstacles:
+        # 画面に映る範囲の動く障害物だけを描画
+        for obstacle in self.moving_index.query(camera_y, camera_y + screen.get_height()):
             obstacle.draw(screen, camera_y)
+    
+    def draw_static(self, screen, camera_y=0):
+        """
+        静的レイヤーのうち、画面に映る範囲のタイルを描画
         
-        # ゴールエリアの描画
-        if self.goal:
-            goal_pos = (self.goal["position"][0], self.goal["position"][1] - camera_y)
-            goal_width = self.goal["width"]
+        Args:
+            screen (pygame.Surface): 描画対象の画面
+            camera_y (int): カメラのY位置オフセット
+        """
+        first = int(camera_y // TILE_HEIGHT)
+        last = int((camera_y + screen.get_height() - 1) // TILE_HEIGHT)
+        for index in range(first, last + 1):
+            # タイルの上下の余白を除いた部分だけを貼り付ける
+            screen.blit(
+                self.get_tile(index),
+                (0, round(index * TILE_HEIGHT - camera_y)),
+                (0, TILE_MARGIN, config.WIDTH, TILE_HEIGHT)
+            )
+    
+    def get_tile(self, index):
+        """
+        静的レイヤーのタイルを取得（なければ描画してキャッシュに追加）
+        
+        Args:
+            index (int): タイル番号（コース上端からTILE_HEIGHTごと）
+        
+        Returns:
+            pygame.Surface: タイル（上下にTILE_MARGINの余白付き）
+        """
+        tile = self.tiles.get(index)
+        if tile is not None:
+            self.tiles.move_to_end(index)
+            return tile
+        
+        tile = self.render_tile(index)
+        self.tiles[index] = tile
+        if len(self.tiles) > TILE_CACHE_SIZE:
+            self.tiles.popitem(last=False)
+        return tile
+    
+    def render_tile(self, index):
+        """
+        壁・ピン・ゴールを1枚のタイルに描画する
+        
+        各要素の描画処理をそのまま使い、タイル上端（余白を含む）をカメラ位置として描画する
+        
+        Args:
+            index (int): タイル番号
+        
+        Returns:
+            pygame.Surface: 透明背景のタイル
+        """
+        tile = pygame.Surface((config.WIDTH, TILE_HEIGHT + 2 * TILE_MARGIN), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert_alpha()
+        tile.fill((0, 0, 0, 0))
+        
+        tile_camera_y = index * TILE_HEIGHT - TILE_MARGIN
+        for element in self.static_index.query(tile_camera_y, tile_camera_y + tile.get_height()):
+            element.draw(tile, tile_camera_y)
+        self.draw_goal(tile, tile_camera_y)
+        
+        # 透明部分をランレングス圧縮して貼り付けを高速化（ピクセルごとのアルファはそのまま）
+        tile.set_alpha(255, pygame.RLEACCEL)
+        return tile
+    
+    def draw_goal(self, screen, camera_y=0):
+        """
+        ゴールラインと"GOAL"テキストを描画
+        
+        Args:
+            screen (pygame.Surface): 描画対象の画面
+            camera_y (int): カメラのY位置オフセット
+        """
+        if not self.goal:
+            return
+        
+        goal_pos = (self.goal["position"][0], self.goal["position"][1] - camera_y)
+        goal_width = self.goal["width"]
+        
+        # 描画先の範囲内にある場合のみ描画
+        if 0 <= goal_pos[1] <= screen.get_height():
+            # ゴールライン
+            pygame.draw.line(
+                screen,
+                (255, 215, 0),  # 金色
+                (goal_pos[0] - goal_width / 2, goal_pos[1]),
+                (goal_pos[0] + goal_width / 2, goal_pos[1]),
+                5
+            )
             
-            # 画面内にある場合のみ描画
-            if 0 <= goal_pos[1] <= config.HEIGHT:
-                # ゴールライン
-                pygame.draw.line(
-                    screen,
-                    (255, 215, 0),  # 金色
-                    (goal_pos[0] - goal_width / 2, goal_pos[1]),
-                    (goal_pos[0] + goal_width / 2, goal_pos[1]),
-                    5
-                )
-                
-                # "GOAL" テキスト
-                font = pygame.font.SysFont("Arial", 36)
-                text_surface = font.render("GOAL", True, (255, 215, 0))
-                text_rect = text_surface.get_rect(center=(goal_pos[0], goal_pos[1] - 30))
-                screen.blit(text_surface, text_rect)
+            # "GOAL" テキスト（フォントは初回のみ作成）
+            if self.goal_font is None:
+                self.goal_font = pygame.font.SysFont("Arial", 36)
+            text_surface = self.goal_font.render("GOAL", True, (255, 215, 0))
+            text_rect = text_surface.get_rect(center=(goal_pos[0], goal_pos[1] - 30))
+            screen.blit(text_surface, text_rect)
     
-    def update(self, dt):
+    def update(self, dt, active_range=None):
         """
         コース内の動的要素を更新
         
+        active_rangeを指定した場合は、その範囲と重なる動く障害物だけを更新する。
+        範囲外の障害物は止めておき、範囲に入ったときに止めていた時間の分を
+        まとめて進める（回転は一定速度なので、毎フレーム更新した場合と同じ角度になる）。
+        
         Args:
             dt (float): 時間の経過（秒）
+            active_range (tuple): 更新する縦方向の範囲 (y_min, y_max)。Noneの場合はすべて更新
         """
-        # 動的な障害物を更新
-        for obstacle in self.obstacles:
-            obstacle.update(dt)
+        self.time += dt
+        if active_range is None:
+            targets = self.moving_obstacles
+        else:
+            targets = self.moving_index.query(*active_range)
+        
+        # 動的な障害物を更新（前回の更新からの経過時間分）
+        for obstacle in targets:
+            obstacle.update(self.time - self.updated_at[obstacle])
+            self.updated_at[obstacle] = self.time
@@ -1,7 +1,13 @@
 import pygame
 import cv2
 import numpy as np
+import math
 import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
 import time
 from datetime import datetime
 import config
@@ -15,17 +21,102 @@ except ImportError:
     print("警告: OpenCVが見つかりません。ビデオ出力が無効になっています。")
     print("OpenCVをインストールするには: pip install opencv-python")
 
+# FFmpegがあれば生フレームをパイプで渡して1回でエンコードする
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
+
+# FFmpegでエンコードする場合のコーデックとスレッド数（0は自動）
+VIDEO_CODEC = "libx264"
+ENCODER_THREADS = 0
+
+# エンコーダスレッドへ渡すフレームキューの長さと、満杯時の動作
+# "block": エンコーダが追いつくまで待つ（全フレームを記録）
+# "drop": そのフレームを破棄してゲームループを止めない（破棄したフレームの位置には
+#         エンコーダが直前のフレームを繰り返し書き込むため、動画の長さは変わらない）
+ENCODER_QUEUE_SIZE = 32
+QUEUE_FULL_POLICIES = ("block", "drop")
+
+def ffmpeg_rawvideo_command(filename, width, height, fps, codec=VIDEO_CODEC,
+                            bitrate=None, threads=ENCODER_THREADS):
+    """
+    標準入力からBGRAの生フレームを受け取ってエンコードするFFmpegのコマンドを作成
+    
+    Args:
+        filename (str): 出力ファイル名
+        width (int): ビデオの幅
+        height (int): ビデオの高さ
+        fps (int): フレームレート
+        codec (str): ビデオコーデック
+        bitrate (str): ビットレート（例: "8000k"、Noneならコーデックの既定値）
+        threads (int): エンコードスレッド数（0は自動）
+    
+    Returns:
+        list: FFmpegのコマンド
+    """
+    command = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "rawvideo",
+        "-pix_fmt", "bgra",
+        "-s", f"{width}x{height}",
+        "-framerate", str(fps),
+        "-i", "pipe:0",
+        "-c:v", codec,
+        "-pix_fmt", "yuv420p",  # 再生環境の互換性のため
+        "-threads", str(threads),
+    ]
+    if bitrate:
+        command += ["-b:v", str(bitrate)]
+    command += ["-movflags", "+faststart", filename]
+    return command
+
+def surface_bgra_view(surface):
+    """
+    サーフェスのピクセルバッファをコピーせずに (height, width, 4) のBGRA配列として参照する
+    
+    32ビットのBGRA/BGRX形式（リトルエンディアンでRマスクが0xFF0000）のサーフェスのみ対応し、
+    それ以外の形式ではNoneを返す。配列が残っている間はサーフェスがロックされるため、
+    次の描画の前に参照を破棄すること。
+    
+    録画ではVideoExporter.capture_frame()がこの配列のコピーを1回だけ取る。キューに
+    入ったフレームはエンコーダスレッドが後から書き込むため、画面の再描画で内容が
+    変わらないようにするにはこのコピーが必要になる。
+    
+    Args:
+        surface (pygame.Surface): 参照するサーフェス
+    
+    Returns:
+        numpy.ndarray: BGRA配列（未対応の形式ならNone）
+    """
+    if (surface.get_bitsize() != 32 or sys.byteorder != "little" or
+            surface.get_masks()[:3] != (0xFF0000, 0xFF00, 0xFF)):
+        return None
+    width, height = surface.get_size()
+    pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint8)
+    return pixels.reshape(height, surface.get_pitch() // 4, 4)[:, :width]
+
 class VideoExporter:
     """
     ビデオ出力を管理するクラス
     シミュレーションのフレームをキャプチャし、動画ファイルとして保存
+    
+    capture_frame()はフレームをコピーしてキューに入れるだけで、エンコードは
+    専用のエンコーダスレッドで行う。エンコードが遅れてもゲームループは止まらない
+    （キューが満杯になった場合の動作はqueue_policyで指定する）。
+    
+    動画のkフレーム目はシミュレーション時間k/fps秒の状態を表す。ゲームループの
+    実際の速度に関係なく動画の長さがシミュレーション時間と一致するよう、
+    frames_due()で書き出すフレーム数を求め、その数だけcapture_frame()で書き込む。
     """
     def __init__(self, width=config.WIDTH, height=config.HEIGHT, fps=config.VIDEO_FPS,
                  filename_prefix=config.VIDEO_FILENAME_PREFIX, output_dir=config.VIDEO_DIR,
-                 bitrate=config.VIDEO_BITRATE):
+                 bitrate=config.VIDEO_BITRATE, codec=VIDEO_CODEC, threads=ENCODER_THREADS,
+                 queue_size=ENCODER_QUEUE_SIZE, queue_policy="block", record=None):
         """
         VideoExporterを初期化
         
+        FFmpegがあれば生フレームをパイプで1つのFFmpegプロセスに渡し、
+        指定したコーデック・ビットレートで1回だけエンコードする。
+        FFmpegがない場合はOpenCVのmp4vで書き込む（ビットレートは指定できない）。
+        
         Args:
             width (int): ビデオの幅
             height (int): ビデオの高さ
@@ -33,11 +124,23 @@ class VideoExporter:
             filename_prefix (str): 出力ファイル名のプレフィックス
             output_dir (str): 出力ディレクトリ
             bitrate (str): ビットレート（例: "8000k"）
+            codec (str): FFmpegで使用するビデオコーデック
+            threads (int): FFmpegのエンコードスレッド数（0は自動）
+            queue_size (int): エンコーダスレッドへ渡すフレームキューの長さ
+            queue_policy (str): キューが満杯の場合の動作（"block": 待機, "drop": 破棄）
+            record (bool): 録画するかどうか（Noneの場合はconfig.RECORD_VIDEOに従う）
         """
-        if not OPENCV_AVAILABLE or not config.RECORD_VIDEO:
-            self.video_writer = None
+        if queue_policy not in QUEUE_FULL_POLICIES:
+            raise ValueError(f"queue_policyは{QUEUE_FULL_POLICIES}のいずれかを指定してください: {queue_policy}")
+        
+        self.video_writer = None
+        self.process = None
+        self._thread = None
+        if record is None:
+            record = config.RECORD_VIDEO
+        if not (FFMPEG_AVAILABLE or OPENCV_AVAILABLE) or not record:
             self.enabled = False
-            print("ビデオ出力は無効です（OpenCVが見つからないか、RECORD_VIDEO=False）。")
+            print("ビデオ出力は無効です（FFmpeg・OpenCVが見つからないか、RECORD_VIDEO=False）。")
             return
 
         self.enabled = True
@@ -45,13 +148,27 @@ class VideoExporter:
         self.height = height
         self.fps = fps
         self.bitrate = bitrate
+        self.codec = codec
+        self.threads = threads
         
-        # フレームカウンター（処理フレーム数）
+        # フレームカウンター（キャプチャしたフレーム数、エンコードしたフレーム数）
         self.frame_count = 0
+        self.encoded_frames = 0
+        
+        # キューが満杯だった回数（"block"では待機した回数、"drop"では破棄したフレーム数）
+        self.queue_policy = queue_policy
+        self.blocked_frames = 0
+        self.dropped_frames = 0
+        # 破棄したが、まだ直前のフレームで埋めていないフレーム数
+        self._owed_repeats = 0
         
         # FPS計測用（実行時間計測）
+        # キャプチャ側はゲームループから見た処理速度、エンコード側はエンコーダスレッドの処理速度
         self.start_time = time.time()
         self.processing_fps = 0
+        self.capture_time = 0.0
+        self.encode_time = 0.0
+        self.error = None
         
         # 出力ディレクトリの作成（存在しなければ）
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -65,103 +182,243 @@ class VideoExporter:
             f"{filename_prefix}_{timestamp}.mp4"
         )
 
-        # コーデックの設定とVideoWriterの作成
-        # 'mp4v'はMP4ファイル用のコーデック
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         try:
-            self.video_writer = cv2.VideoWriter(
-                self.filename, 
-                fourcc, 
-                self.fps, 
-                (self.width, self.height)
-            )
+            if FFMPEG_AVAILABLE:
+                # 生フレームをFFmpegの標準入力へ渡してエンコードする
+                self.process = subprocess.Popen(
+                    ffmpeg_rawvideo_command(self.filename, self.width, self.height, self.fps,
+                                            self.codec, self.bitrate, self.threads),
+                    stdin=subprocess.PIPE
+                )
+                encoder = f"FFmpeg ({self.codec})"
+            else:
+                # コーデックの設定とVideoWriterの作成
+                # 'mp4v'はMP4ファイル用のコーデック
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                self.video_writer = cv2.VideoWriter(
+                    self.filename, 
+                    fourcc, 
+                    self.fps, 
+                    (self.width, self.height)
+                )
+                
+                if not self.video_writer.isOpened():
+                    raise IOError(f"'{self.filename}'のVideoWriterを開けませんでした")
+                encoder = "OpenCV (mp4v)"
             
-            if not self.video_writer.isOpened():
-                raise IOError(f"'{self.filename}'のVideoWriterを開けませんでした")
+            # エンコーダスレッドの開始
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+            self._thread.start()
             
             print(f"ビデオ録画有効。保存先: {self.filename}")
-            print(f"解像度: {self.width}x{self.height}, FPS: {self.fps}, ビットレート: {self.bitrate}")
+            print(f"解像度: {self.width}x{self.height}, FPS: {self.fps}, "
+                  f"ビットレート: {self.bitrate}, エンコーダ: {encoder}, "
+                  f"キュー: {queue_size}フレーム（満杯時: {queue_policy}）")
         except Exception as e:
             print(f"VideoWriter初期化エラー: {e}")
             self.video_writer = None
+            self.process = None
             self.enabled = False
 
-    def capture_frame(self, surface):
+    def frames_due(self, sim_time):
+        """
+        シミュレーション時間sim_timeまでに書き出すべき残りのフレーム数を返す
+        
+        Args:
+            sim_time (float): 録画開始からのシミュレーション時間（秒）
+        
+        Returns:
+            int: 書き出すフレーム数（0ならこのフレームは描画・キャプチャ不要、
+                 2以上なら同じフレームを繰り返して書き出す）
+        """
+        if not self.enabled:
+            return 0
+        # 浮動小数点の誤差でちょうどフレームの時刻を取りこぼさないよう僅かに余裕を持たせる
+        target = math.floor(sim_time * self.fps + 1e-6) + 1
+        return max(0, target - self.frame_count)
+
+    def capture_frame(self, surface, count=1):
         """
-        Pygameサーフェスからフレームをキャプチャし、動画に書き込む
+        Pygameサーフェスからフレームをキャプチャし、エンコーダスレッドへ渡す
         
         Args:
             surface (pygame.Surface): キャプチャするPygameサーフェス
+            count (int): 書き出すフレーム数（同じフレームを繰り返す場合は2以上）
+        
+        Returns:
+            bool: すべてのフレームをキューに入れた場合True（破棄した場合False）
         """
-        if not self.enabled or self.video_writer is None:
-            return
+        if not self.enabled or self._thread is None:
+            return False
 
         try:
-            # Pygameサーフェスからピクセルデータを取得
-            frame_data = pygame.surfarray.array3d(surface)
+            capture_start = time.perf_counter()
             
-            # Pygameは(width, height, channels)、OpenCVは(height, width, channels)の順
-            # PygameはRGB、OpenCVはBGRを使用
-            frame_data = frame_data.swapaxes(0, 1)  # 幅と高さを入れ替え
-            frame_data = cv2.cvtColor(frame_data, cv2.COLOR_RGB2BGR)  # RGBからBGRへ変換
-
-            # 動画に書き込み
-            self.video_writer.write(frame_data)
+            # エンコーダスレッドが書き込む前に画面は次のフレームで上書きされるため、
+            # BGRAのピクセルバッファをここで1回だけコピーする（これ以外の中間コピーはない）
+            frame_data = surface_bgra_view(surface)
+            if frame_data is not None:
+                frame_data = frame_data.copy()
+            else:
+                # その他のピクセル形式はsurfarrayでコピーしてBGRAに変換する
+                # Pygameは(width, height, channels)、OpenCVは(height, width, channels)の順
+                frame_data = pygame.surfarray.array3d(surface).swapaxes(0, 1)
+                frame_data = cv2.cvtColor(frame_data, cv2.COLOR_RGB2BGRA)
+            
+            # フレームカウンターをインクリメント（破棄したフレームも動画の時刻は進む）
+            self.frame_count += count
             
-            # フレームカウンターをインクリメント
-            self.frame_count += 1
+            # キューには(フレーム, 書き出す回数, 先に繰り返す直前のフレームの回数)を入れる
+            # 破棄したフレームの位置はエンコーダが直前のフレームで埋めるため、
+            # 動画は常にframe_countフレームになる
+            queued = True
+            if self.queue_policy == "drop":
+                # キューが満杯ならこのフレームを破棄する
+                try:
+                    self._queue.put_nowait((frame_data, count, self._owed_repeats))
+                    self._owed_repeats = 0
+                except queue.Full:
+                    self.dropped_frames += count
+                    self._owed_repeats += count
+                    queued = False
+            else:
+                # キューが満杯ならエンコーダが追いつくまで待つ
+                if self._queue.full():
+                    self.blocked_frames += 1
+                self._queue.put((frame_data, count, 0))
+            self.capture_time += time.perf_counter() - capture_start
             
             # 10フレームごとに実際のFPSを計算
             if self.frame_count % 10 == 0:
                 elapsed_time = time.time() - self.start_time
                 if elapsed_time > 0:
                     self.processing_fps = self.frame_count / elapsed_time
+            return queued
         except Exception as e:
             print(f"フレームキャプチャエラー: {e}")
-            # エラー時にはこれ以上の録画を無効にするオプション
-            # self.enabled = False
-            # self.finalize()
+            return False
+
+    def _encode_loop(self):
+        """エンコーダスレッド: キューからフレームを取り出してエンコーダに書き込む"""
+        last_frame = None
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            if self.error is not None:
+                continue  # エラー後はキューを空にするだけ
+            frame_data, copies, repeats = entry
+            try:
+                encode_start = time.perf_counter()
+                if repeats and last_frame is not None:
+                    # 破棄したフレームの位置には直前のフレームを繰り返す
+                    self._write_frame(last_frame, repeats)
+                if copies:
+                    self._write_frame(frame_data, copies)
+                    last_frame = frame_data
+                self.encode_time += time.perf_counter() - encode_start
+            except Exception as e:
+                self.error = e
+                print(f"フレームエンコードエラー: {e}")
+
+    def _write_frame(self, frame_data, count):
+        """
+        BGRAのフレームをエンコーダにcount回書き込む（エンコーダスレッドから呼ぶ）
+        
+        Args:
+            frame_data (numpy.ndarray): BGRAのフレーム
+            count (int): 書き込む回数
+        """
+        if self.process is not None:
+            # FFmpegにはBGRAのまま渡す
+            for _ in range(count):
+                self.process.stdin.write(frame_data)
+        else:
+            # VideoWriter用にBGR変換は1回だけ行う
+            frame_bgr = cv2.cvtColor(frame_data, cv2.COLOR_BGRA2BGR)
+            for _ in range(count):
+                self.video_writer.write(frame_bgr)
+        self.encoded_frames += count
+
+    def get_stats(self):
+        """
+        キャプチャ側とエンコード側の処理統計を返す
+        
+        Returns:
+            dict: キャプチャ・エンコードしたフレーム数、それぞれの処理FPS
+                  （1秒あたりに処理できるフレーム数）、待機回数、破棄フレーム数
+        """
+        return {
+            "captured_frames": self.frame_count,
+            "encoded_frames": self.encoded_frames,
+            "capture_fps": self.frame_count / self.capture_time if self.capture_time > 0 else 0,
+            "encode_fps": self.encoded_frames / self.encode_time if self.encode_time > 0 else 0,
+            "blocked_frames": self.blocked_frames,
+            "dropped_frames": self.dropped_frames,
+        }
 
     def finalize(self):
-        """VideoWriterオブジェクトを解放"""
-        if self.enabled and self.video_writer is not None:
+        """
+        キューに残ったフレームを書き出し、エンコーダを終了してファイルを閉じる
+        
+        Returns:
+            bool: 動画を最後まで書き出せた場合True（エンコードエラーで不完全な場合False）
+        """
+        completed = False
+        if self.enabled and self._thread is not None:
             print(f"ビデオ出力の終了処理中: {self.filename}")
             
-            # FFmpegでビットレートを調整する場合のコマンド例（OpenCVでは直接指定できない）
-            # この部分は実装環境によって異なる場合があります
+            # 最後にキューへ入れたフレーム以降に破棄した分を直前のフレームで埋め、
+            # キューが空になるまでエンコーダスレッドに書き出させてから終了させる
+            if self._owed_repeats:
+                self._queue.put((None, 0, self._owed_repeats))
+                self._owed_repeats = 0
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            
             try:
-                self.video_writer.release()
-                print("VideoWriter解放完了")
-                
-                # ビットレートを調整するために二次処理（オプション）
-                if self.bitrate and os.path.exists(self.filename):
-                    temp_file = self.filename + ".temp.mp4"
-                    ffmpeg_cmd = f'ffmpeg -i "{self.filename}" -b:v {self.bitrate} "{temp_file}" -y'
-                    
-                    print(f"FFmpegでビットレート調整中: {self.bitrate}")
-                    result = os.system(ffmpeg_cmd)
-                    
-                    if result == 0 and os.path.exists(temp_file):
-                        os.remove(self.filename)
-                        os.rename(temp_file, self.filename)
-                        print(f"ビットレート調整完了: {self.bitrate}")
+                if self.process is not None:
+                    # 標準入力を閉じるとFFmpegが残りのフレームをエンコードして終了する
+                    self.process.stdin.close()
+                    result = self.process.wait()
+                    if result != 0:
+                        print(f"FFmpegエンコードエラー（終了コード: {result}）")
+                        if self.error is None:
+                            self.error = RuntimeError(f"FFmpegの終了コード: {result}")
                     else:
-                        print("ビットレート調整失敗。元のファイルを保持します。")
+                        print("FFmpegエンコード完了")
+                else:
+                    self.video_writer.release()
+                    print("VideoWriter解放完了")
             except Exception as e:
                 print(f"ビデオ終了処理エラー: {e}")
+                if self.error is None:
+                    self.error = e
             
             # 処理統計の表示
             if self.frame_count > 0:
                 elapsed_time = time.time() - self.start_time
                 avg_fps = self.frame_count / elapsed_time if elapsed_time > 0 else 0
-                print(f"処理フレーム数: {self.frame_count}")
+                stats = self.get_stats()
+                print(f"処理フレーム数: {self.frame_count}（エンコード: {self.encoded_frames}）")
                 print(f"処理時間: {elapsed_time:.2f}秒")
                 print(f"平均処理FPS: {avg_fps:.2f}")
+                print(f"キャプチャ処理FPS: {stats['capture_fps']:.2f}, "
+                      f"エンコード処理FPS: {stats['encode_fps']:.2f}")
+                print(f"キュー満杯: 待機 {self.blocked_frames}回, 破棄 {self.dropped_frames}フレーム")
             
             self.video_writer = None  # 再利用されないようにする
-            print("ビデオ出力完了。")
+            self.process = None
+            if self.error is not None:
+                print(f"エンコードエラーのため動画が不完全です: {self.filename}（{self.error}）")
+            else:
+                print("ビデオ出力完了。")
+                completed = True
         
         self.enabled = False  # 終了処理されたとマーク
+        return completed
 
 class AudioManager:
     """
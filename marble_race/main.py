@@ -1,8 +1,8 @@
 import pygame
 import pymunk
+import argparse
 import sys
 import os
-import time
 import random
 import math
 
@@ -21,14 +21,57 @@ from marble import Marble
 from course import Course
 from renderer import Renderer
 from exporter import VideoExporter, AudioManager
+from clock import RealClock, VirtualClock
+
+# 物理演算の固定ステップレート（Hz）。フレームレートに関係なく常に 1/PHYSICS_HZ 秒ずつ進める
+PHYSICS_HZ = 120
+# 1フレームで実行する物理サブステップ数の上限（処理落ち時にこれを超えた分は切り捨てる）
+MAX_SUBSTEPS = 8
+# 描画するマーブル位置を直前と現在の物理ステップの間で補間するかどうか
+INTERPOLATE_RENDER = True
+
+# 動く障害物を更新する範囲: カメラの表示範囲とマーブルがいる範囲を、上下にこの幅（ピクセル）だけ
+# 広げたもの。範囲外の障害物はマーブルが近づくまで止めておく（フリッパーの長さより十分大きくする）
+ACTIVE_BAND_MARGIN = 400
+
+# オフラインモードの台本: イントロ各ステージ（タイトル, マーブル紹介）の表示時間（秒）
+AUTO_INTRO_SECONDS = (2.0, 3.0)
+# オフラインモードで全マーブルのゴール後に録画を続ける時間（秒）
+AUTO_FINISH_HOLD_SECONDS = 3.0
+# オフラインモードでのレース時間の上限（秒）。ゴールできないマーブルがいても終了する
+AUTO_MAX_RACE_SECONDS = 300.0
 
 class MarbleRace:
     """
     マーブルレースのメインクラス
     シミュレーション全体を管理
     """
-    def __init__(self):
-        """ゲームの初期化"""
+    def __init__(self, physics_hz=PHYSICS_HZ, max_substeps=MAX_SUBSTEPS, interpolate=INTERPOLATE_RENDER,
+                 offline=False, record=None, slot_order=None):
+        """
+        ゲームの初期化
+        
+        Args:
+            physics_hz (int): 物理演算の固定ステップレート（Hz）
+            max_substeps (int): 1フレームあたりの物理サブステップ数の上限
+            interpolate (bool): 描画位置を物理ステップ間で補間するかどうか
+            offline (bool): オフラインレンダリングモード。画面なし（SDLダミードライバ）で
+                録画し、イントロを自動で進め、仮想時計で待機せずに最速で実行する
+            record (bool): 録画するかどうか（Noneの場合はRECORD_VIDEOまたはオフラインモードなら録画）
+            slot_order (list): 各マーブル（色）のスタート位置の番号（Noneの場合は色の順番どおり）
+        """
+        self.offline = offline
+        if record is None:
+            record = config.RECORD_VIDEO or offline
+        
+        # 各マーブルのスタート位置（slot_order[色] = START_POSITIONSの番号）
+        self.slot_order = list(slot_order) if slot_order is not None else list(range(4))
+        self.start_positions = [config.START_POSITIONS[slot] for slot in self.slot_order]
+        if offline:
+            # 画面とサウンドデバイスを使わない（pygame.initより前に設定する必要がある）
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+        
         # Pygameの初期化
         pygame.init()
         
@@ -36,8 +79,12 @@ class MarbleRace:
         self.screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT))
         pygame.display.set_caption(config.TITLE)
         
-        # クロック（フレームレート制御）
-        self.clock = pygame.time.Clock()
+        # 時計（通常は実時間でフレームレートを制御。オフラインでは動画1フレーム分ずつ
+        # 待機せずに進む仮想時計を使う）
+        if offline:
+            self.clock = VirtualClock(config.VIDEO_FPS)
+        else:
+            self.clock = RealClock(config.FPS)
         
         # 物理エンジン（空間）の設定
         self.space = pymunk.Space()
@@ -57,22 +104,38 @@ class MarbleRace:
         self.race_state = config.STATE_READY
         self.race_time = 0  # レース時間
         
+        # 起動からのシミュレーション時間（録画するフレームの時刻に使用）
+        self.sim_time = 0
+        
+        # 固定ステップの物理演算（実時間の経過をアキュムレータに貯め、1/physics_hz秒ずつ消費する）
+        self.physics_dt = 1.0 / physics_hz
+        self.max_substeps = max_substeps
+        self.interpolate = interpolate
+        self.accumulator = 0.0
+        self.render_alpha = 1.0  # 描画時の補間係数
+        self.physics_steps = 0  # 実行した物理ステップ数
+        self.dropped_time = 0.0  # サブステップ上限により切り捨てた時間（秒）
+        
         # カメラの位置（Y座標のみ）
         self.camera_y = 0
         
         # レンダラーの作成
-        self.renderer = Renderer()
+        self.renderer = Renderer(self.clock)
         
         # ビデオ出力の設定
         self.video_exporter = None
-        if config.RECORD_VIDEO:
-            self.video_exporter = VideoExporter()
+        if record:
+            self.video_exporter = VideoExporter(record=True)
         
         # 音声マネージャー
         self.audio_manager = AudioManager()
         
         # イントロステージ（0: タイトル画面, 1: マーブル紹介）
         self.intro_stage = 0
+        self.intro_stage_started = self.clock.now()
+        
+        # オフラインモードで全マーブルがゴールした時刻
+        self.finished_at = None
         
         # カウントダウン
         self.countdown_value = 3
@@ -83,7 +146,7 @@ class MarbleRace:
         self.running = True
         
         # ビデオ出力ディレクトリの作成
-        if config.RECORD_VIDEO:
+        if record:
             os.makedirs(os.path.join("marble_race", config.VIDEO_DIR), exist_ok=True)
     
     def setup_collision_handlers(self):
@@ -163,7 +226,7 @@ class MarbleRace:
         
         # 4種類のマーブルを作成
         for i in range(4):
-            position = config.START_POSITIONS[i]
+            position = self.start_positions[i]
             marble = Marble(position, i, self.space)
             self.marbles.append(marble)
     
@@ -189,14 +252,14 @@ class MarbleRace:
         # カウントダウンを開始
         self.is_countdown = True
         self.countdown_value = 3
-        self.countdown_timer = time.time()
+        self.countdown_timer = self.clock.now()
         
         # BGM開始
         self.audio_manager.play_music()
     
     def update_countdown(self):
         """カウントダウンを更新"""
-        current_time = time.time()
+        current_time = self.clock.now()
         elapsed = current_time - self.countdown_timer
         
         # 1秒ごとにカウントダウン
@@ -215,17 +278,87 @@ class MarbleRace:
                 # スタート音
                 self.audio_manager.play_sound("start")
     
+    def advance_intro(self):
+        """イントロを次のステージへ進める（タイトル → マーブル紹介 → カウントダウン）"""
+        if self.intro_stage == 0:
+            # タイトル画面からマーブル紹介へ
+            self.intro_stage = 1
+            self.create_marbles()
+        elif self.intro_stage == 1:
+            # マーブル紹介からレース開始
+            self.intro_stage = None
+            self.start_race()
+        self.intro_stage_started = self.clock.now()
+    
+    def update_script(self):
+        """オフラインモードの台本: イントロを自動で進め、レース終了後に実行を終える"""
+        now = self.clock.now()
+        if self.intro_stage is not None:
+            if now - self.intro_stage_started >= AUTO_INTRO_SECONDS[self.intro_stage]:
+                self.advance_intro()
+            return
+        
+        if self.race_state == config.STATE_FINISHED:
+            if self.finished_at is None:
+                self.finished_at = now
+            elif now - self.finished_at >= AUTO_FINISH_HOLD_SECONDS:
+                self.running = False
+        elif self.race_time >= AUTO_MAX_RACE_SECONDS:
+            print(f"レース時間の上限（{AUTO_MAX_RACE_SECONDS:.0f}秒）に達したため終了します")
+            self.running = False
+    
     def update(self, dt):
         """
-        ゲーム状態を更新
+        ゲーム状態を更新（フレームごとに1回呼ばれる）
+        
+        経過時間をアキュムレータに加え、固定ステップの物理演算を必要な回数だけ実行する。
+        フレームの長さに関係なく物理演算は常に同じ刻み幅で進むため、処理落ちしても
+        大きなステップで薄い壁をすり抜けることがなく、レース結果も再現可能になる。
         
         Args:
             dt (float): 経過時間（秒）
         """
+        self.accumulator += dt
+        
+        steps = 0
+        while self.accumulator >= self.physics_dt and steps < self.max_substeps:
+            self.fixed_update(self.physics_dt)
+            self.accumulator -= self.physics_dt
+            steps += 1
+        
+        # 上限に達しても消化しきれない分は切り捨てる（処理落ち時はスローモーションになる）
+        if self.accumulator >= self.physics_dt:
+            self.dropped_time += self.accumulator - self.accumulator % self.physics_dt
+            self.accumulator %= self.physics_dt
+        
+        # オフラインモードではイントロとレース終了を自動で処理
+        if self.offline:
+            self.update_script()
+        
+        # 次の物理ステップまでの進み具合（描画位置の補間に使用）
+        self.render_alpha = self.accumulator / self.physics_dt if self.interpolate else 1.0
+        
+        # カメラの位置を更新
+        self.update_camera()
+    
+    def fixed_update(self, dt):
+        """
+        固定ステップ1回分の状態更新
+        
+        Args:
+            dt (float): 物理ステップの刻み幅（秒）
+        """
+        self.sim_time += dt
+        self.physics_steps += 1
+        
         # レース中のみ時間を更新
         if self.race_state == config.STATE_RUNNING:
             self.race_time += dt
         
+        # 描画位置の補間用に、ステップ前の位置を記録
+        for marble in self.marbles:
+            marble.save_position()
+        
         # カウントダウン中の処理
         if self.is_countdown:
             self.update_countdown()
@@ -233,8 +366,9 @@ class MarbleRace:
             # カウントダウン中は物理演算を適用せず、初期位置を維持
             for i, marble in enumerate(self.marbles):
                 # 初期位置に固定
-                marble.body.position = config.START_POSITIONS[i]
+                marble.body.position = self.start_positions[i]
                 marble.body.velocity = (0, 0)
+                marble.save_position()
         else:
             # レース中のみ物理演算を更新
             self.space.step(dt)
@@ -243,11 +377,23 @@ class MarbleRace:
             for marble in self.marbles:
                 marble.update()
             
-            # 障害物など動的要素の更新
-            self.course.update(dt)
+            # 障害物など動的要素の更新（カメラとマーブルの周辺のみ）
+            self.course.update(dt, self.active_band())
+    
+    def active_band(self):
+        """
+        動く障害物を更新する縦方向の範囲を取得
         
-        # カメラの位置を更新
-        self.update_camera()
+        Returns:
+            tuple: (y_min, y_max) カメラの表示範囲とすべてのマーブルを含む範囲
+        """
+        y_min = self.camera_y
+        y_max = self.camera_y + config.HEIGHT
+        for marble in self.marbles:
+            y = marble.get_position_y()
+            y_min = min(y_min, y)
+            y_max = max(y_max, y)
+        return (y_min - ACTIVE_BAND_MARGIN, y_max + ACTIVE_BAND_MARGIN)
     
     def update_camera(self):
         """カメラの位置を更新（先頭のマーブルを追従）"""
@@ -290,14 +436,9 @@ class MarbleRace:
                 
                 # スペースキーでゲーム状態切り替え
                 elif event.key == pygame.K_SPACE:
-                    if self.intro_stage == 0:
-                        # タイトル画面からマーブル紹介へ
-                        self.intro_stage = 1
-                        self.create_marbles()
-                    elif self.intro_stage == 1:
-                        # マーブル紹介からレース開始
-                        self.intro_stage = None
-                        self.start_race()
+                    if self.intro_stage is not None:
+                        # タイトル画面 → マーブル紹介 → レース開始
+                        self.advance_intro()
                     elif self.race_state == config.STATE_FINISHED:
                         # レース終了状態からリセット
                         self.reset_game()
@@ -325,8 +466,8 @@ class MarbleRace:
         # コース描画
         self.renderer.draw_course(self.screen, self.course, self.camera_y)
         
-        # マーブル描画
-        self.renderer.draw_marbles(self.screen, self.marbles, self.camera_y)
+        # マーブル描画（物理ステップ間で補間した位置）
+        self.renderer.draw_marbles(self.screen, self.marbles, self.camera_y, self.render_alpha)
         
         # UI描画
         self.renderer.draw_ui(
@@ -346,8 +487,8 @@ class MarbleRace:
         try:
             # ゲームループ
             while self.running:
-                # デルタタイム計算（秒単位）
-                dt = self.clock.tick(config.FPS) / 1000.0
+                # デルタタイム計算（秒単位。オフラインモードでは待機しない）
+                dt = self.clock.tick()
                 
                 # イベント処理
                 self.handle_events()
@@ -355,13 +496,21 @@ class MarbleRace:
                 # 状態更新
                 self.update(dt)
                 
-                # 描画
-                self.render()
-                pygame.display.flip()
+                # 録画中は、シミュレーション時間の1/VIDEO_FPS秒ごとの動画フレームに
+                # 当たるステップだけを描画する（録画なしの場合は毎ステップ描画）
+                recording = self.video_exporter is not None and self.video_exporter.enabled
+                frames_due = self.video_exporter.frames_due(self.sim_time) if recording else 0
+                if recording:
+                    # 録画フレームは物理ステップの時刻に合わせるため補間しない
+                    self.render_alpha = 1.0
+                if frames_due or not recording:
+                    # 描画
+                    self.render()
+                    pygame.display.flip()
                 
-                # ビデオ録画
-                if self.video_exporter and self.video_exporter.enabled:
-                    self.video_exporter.capture_frame(self.screen)
+                # ビデオ録画（ステップが複数の動画フレームにまたがる場合は繰り返す）
+                if frames_due:
+                    self.video_exporter.capture_frame(self.screen, frames_due)
         except Exception as e:
             print(f"エラーが発生しました: {e}")
         finally:
@@ -386,8 +535,20 @@ class MarbleRace:
 
 # メイン実行部分
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='マーブルレース')
+    parser.add_argument('--offline', action='store_true',
+                        help='画面なしで最速でレース全体を録画する（イントロは自動で進む）')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='コース（障害物の速度など）の乱数シード')
+    parser.add_argument('--slots', type=int, nargs=4, default=None, metavar='SLOT',
+                        help='Red, Blue, Green, Yellowのスタート位置の番号（例: 2 0 3 1）')
+    args = parser.parse_args()
+    
+    if args.seed is not None:
+        random.seed(args.seed)
+    
     # マーブルレースのインスタンスを作成
-    game = MarbleRace()
+    game = MarbleRace(offline=args.offline, slot_order=args.slots)
     
     # ゲーム実行
     game.run()
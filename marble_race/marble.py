@@ -28,6 +28,9 @@ class Marble:
         self.body = pymunk.Body(self.mass, moment)
         self.body.position = position
         
+        # 直前の物理ステップでの位置（描画位置の補間に使用）
+        self.previous_position = self.body.position
+        
         # 形状の作成（円）
         self.shape = pymunk.Circle(self.body, self.radius)
         self.shape.elasticity = config.MARBLE_ELASTICITY
@@ -66,18 +69,38 @@ class Marble:
             normalized_velocity = self.body.velocity.normalized()
             self.body.velocity = normalized_velocity * max_velocity
     
-    def draw(self, screen, camera_y=0):
+    def save_position(self):
+        """物理ステップの直前に現在位置を記録する（描画位置の補間用）"""
+        self.previous_position = self.body.position
+    
+    def render_position(self, alpha=1.0):
+        """
+        描画位置を取得（直前の物理ステップと現在の位置の間を補間）
+        
+        Args:
+            alpha (float): 補間係数（0: 直前のステップ, 1: 現在のステップ）
+        
+        Returns:
+            pymunk.Vec2d: 描画位置
+        """
+        if alpha >= 1.0:
+            return self.body.position
+        return self.previous_position.interpolate_to(self.body.position, alpha)
+    
+    def draw(self, screen, camera_y=0, alpha=1.0):
         """
         Draw the marble
         
         Args:
             screen (pygame.Surface): Surface to draw on
             camera_y (int): Camera Y position offset
+            alpha (float): Interpolation factor between the previous and current physics step
         """
         # No trail drawing - trails are disabled
         
         # マーブル本体の描画
-        draw_pos = (int(self.body.position.x), int(self.body.position.y - camera_y))
+        position = self.render_position(alpha)
+        draw_pos = (int(position.x), int(position.y - camera_y))
         
         # 画面内にある場合のみ描画
         if -self.radius <= draw_pos[1] <= config.HEIGHT + self.radius:
@@ -9,6 +9,9 @@ class Obstacle:
     障害物の基本クラス
     すべての障害物はこのクラスを継承する
     """
+    # 動かない障害物かどうか（Trueの場合、コースの静的レイヤーに事前に描画される）
+    static = False
+    
     def __init__(self, position, space):
         self.position = position
         self.space = space
@@ -35,6 +38,15 @@ class Obstacle:
         """
         pass
     
+    def y_range(self):
+        """
+        障害物が占める縦方向の範囲（描画・衝突を含む）を取得
+        
+        Returns:
+            tuple: (上端のY座標, 下端のY座標)
+        """
+        return (self.position[1], self.position[1])
+    
     def remove_from_space(self):
         """物理空間から障害物を削除"""
         if self.body and self.shape:
@@ -43,6 +55,8 @@ class Obstacle:
 
 class StaticWall(Obstacle):
     """静的な壁（レースコースの壁）"""
+    static = True
+    
     def __init__(self, p1, p2, thickness, space):
         """
         静的な壁を初期化
@@ -72,6 +86,11 @@ class StaticWall(Obstacle):
         # 物理空間に追加
         space.add(self.body, self.shape)
         
+    def y_range(self):
+        """壁が占める縦方向の範囲（当たり判定の太さを含む）"""
+        margin = self.thickness * 2
+        return (min(self.p1[1], self.p2[1]) - margin, max(self.p1[1], self.p2[1]) + margin)
+    
     def draw(self, screen, camera_y=0):
         """
         壁を描画
@@ -84,9 +103,10 @@ class StaticWall(Obstacle):
         p1 = (self.p1[0], self.p1[1] - camera_y)
         p2 = (self.p2[0], self.p2[1] - camera_y)
         
-        # 画面内にある場合（簡易チェック）
-        if (p1[1] <= config.HEIGHT and p2[1] >= 0) or \
-           (p2[1] <= config.HEIGHT and p1[1] >= 0):
+        # 描画先の範囲内にある場合（簡易チェック）
+        height = screen.get_height()
+        if (p1[1] <= height and p2[1] >= 0) or \
+           (p2[1] <= height and p1[1] >= 0):
             pygame.draw.line(screen, self.color, p1, p2, self.thickness)
 
 
@@ -94,6 +114,8 @@ class Pin(Obstacle):
     """
     ピン（マーブルの方向を変える小さな円形の障害物）
     """
+    static = True
+    
     def __init__(self, position, radius, space):
         """
         ピンを初期化
@@ -121,6 +143,10 @@ class Pin(Obstacle):
         # 物理空間に追加
         space.add(self.body, self.shape)
         
+    def y_range(self):
+        """ピンが占める縦方向の範囲"""
+        return (self.position[1] - self.radius, self.position[1] + self.radius)
+    
     def draw(self, screen, camera_y=0):
         """
         ピンを描画
@@ -132,8 +158,8 @@ class Pin(Obstacle):
         # カメラオフセットを適用
         draw_pos = (int(self.position[0]), int(self.position[1] - camera_y))
         
-        # 画面内にある場合のみ描画
-        if -self.radius <= draw_pos[1] <= config.HEIGHT + self.radius:
+        # 描画先の範囲内にある場合のみ描画
+        if -self.radius <= draw_pos[1] <= screen.get_height() + self.radius:
             pygame.draw.circle(screen, self.color, draw_pos, self.radius)
             # ハイライト（3D効果）
             highlight_pos = (draw_pos[0] - self.radius // 3, draw_pos[1] - self.radius // 3)
@@ -199,6 +225,11 @@ class Flipper(Obstacle):
         # ボディの回転角度を設定
         self.body.angle = self.angle
     
+    def y_range(self):
+        """フリッパーが回転して通る縦方向の範囲"""
+        reach = self.length + self.width
+        return (self.position[1] - reach, self.position[1] + reach)
+    
     def draw(self, screen, camera_y=0):
         """
         フリッパーを描画
@@ -279,6 +310,10 @@ class RotatingDisc(Obstacle):
         # ボディの角速度を設定（速度ベクトルではなく角速度）
         self.body.angular_velocity = self.angular_velocity
     
+    def y_range(self):
+        """円盤が占める縦方向の範囲"""
+        return (self.position[1] - self.radius, self.position[1] + self.radius)
+    
     def draw(self, screen, camera_y=0):
         """
         回転円盤を描画
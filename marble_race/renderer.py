@@ -2,16 +2,25 @@ import pygame
 import math
 import numpy as np
 import config
+from clock import RealClock
 
 class Renderer:
     """
     描画を担当するクラス
     ゲームの視覚的要素をすべて管理
     """
-    def __init__(self):
-        """レンダラーを初期化"""
+    def __init__(self, clock=None):
+        """
+        レンダラーを初期化
+        
+        Args:
+            clock (RealClock | VirtualClock): アニメーション（星の点滅など）の時刻に使う時計
+        """
         pygame.font.init()
         
+        # アニメーション用の時計
+        self.clock = clock if clock is not None else RealClock(config.FPS)
+        
         # フォントの初期化
         try:
             self.font = pygame.font.SysFont("Arial", 24)
@@ -80,7 +89,7 @@ class Renderer:
             pygame.draw.line(screen, color, (0, y), (config.WIDTH, y))
         
         # 星の描画（遠景）
-        current_time = pygame.time.get_ticks() / 1000.0
+        current_time = self.clock.now()
         for star in self.stars:
             # カメラ位置に応じてゆっくり動く（視差効果）
             star_y = star['pos'][1] - camera_y * 0.2
@@ -112,7 +121,7 @@ class Renderer:
                 s.fill((255, 255, 255, cloud['alpha']))
                 screen.blit(s, (cloud['pos'][0] - cloud['size'][0] / 2, cloud_y - cloud['size'][1] / 2))
     
-    def draw_marbles(self, screen, marbles, camera_y):
+    def draw_marbles(self, screen, marbles, camera_y, alpha=1.0):
         """
         マーブルを描画
         
@@ -120,10 +129,11 @@ class Renderer:
             screen (pygame.Surface): 描画対象の画面
             marbles (list): マーブルのリスト
             camera_y (int): カメラのY位置オフセット
+            alpha (float): 物理ステップ間の補間係数（1.0で補間なし）
         """
         # 各マーブルを描画
         for marble in marbles:
-            marble.draw(screen, camera_y)
+            marble.draw(screen, camera_y, alpha)
     
     def draw_course(self, screen, course, camera_y):
         """